@@ -1,37 +1,91 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import func, desc, asc
-from datetime import datetime, timedelta
+from fastapi.responses import ORJSONResponse
+from pydantic import TypeAdapter
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload, load_only
+from sqlalchemy import Date, lambda_stmt, select, func, desc, asc
+from datetime import datetime, time, timedelta, timezone
+from itertools import groupby
+from operator import itemgetter
 from typing import List, Optional
 import logging
+import math
 
+from .. import cache
 from ..database import get_db
-from ..models import Provider, ElectricPrice, PriceAlert, SmartDevice
-from ..models.schemas import *
+from ..models import Provider, ElectricPrice, ElectricPriceHourly, PriceAlert, SmartDevice
+from ..models import schemas
+from ..models.schemas import PriceDataResponse
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Spalten für Preisantworten - ohne den großen raw_data-Blob
+PRICE_COLUMNS = load_only(
+    ElectricPrice.id,
+    ElectricPrice.provider_id,
+    ElectricPrice.timestamp,
+    ElectricPrice.start_time,
+    ElectricPrice.end_time,
+    ElectricPrice.price_per_kwh,
+    ElectricPrice.price_unit,
+    ElectricPrice.price_type,
+    ElectricPrice.taxes,
+    ElectricPrice.grid_fees,
+    ElectricPrice.total_price,
+    ElectricPrice.market_area,
+    ElectricPrice.quality_rating,
+    ElectricPrice.data_source,
+    ElectricPrice.created_at
+)
+
+# Vorkompilierter Validator für Preislisten
+PRICE_LIST_ADAPTER = TypeAdapter(List[schemas.ElectricPrice])
+
+
+def get_now() -> datetime:
+    """Einheitlicher UTC-Zeitpunkt pro Request"""
+    return datetime.now(timezone.utc)
+
+
+def _filter_price_range(stmt, start_time: datetime, end_time: datetime, provider_ids: Optional[List[int]]):
+    """Zeitraum- und Provider-Filter an ein lambda_stmt anhängen"""
+    stmt += lambda s: s.where(
+        ElectricPrice.timestamp >= start_time,
+        ElectricPrice.timestamp <= end_time
+    )
+    if provider_ids:
+        stmt += lambda s: s.where(ElectricPrice.provider_id.in_(provider_ids))
+    return stmt
+
 
 # Provider Endpoints
-@router.get("/providers", response_model=List[Provider])
+@router.get("/providers", response_model=List[schemas.Provider])
 async def get_providers(
     active_only: bool = True,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Alle verfügbaren Stromanbieter abrufen"""
-    query = db.query(Provider)
+    cache_key = cache.PROVIDERS_KEY.format(active_only=active_only)
+    cached = await cache.get_cached(cache_key)
+    if cached is not None:
+        return cached
+    
+    stmt = select(Provider)
     if active_only:
-        query = query.filter(Provider.is_active == True)
+        stmt = stmt.where(Provider.is_active == True)
     
-    return query.all()
+    providers = (await db.execute(stmt)).scalars().all()
+    result = [schemas.Provider.model_validate(p).model_dump(mode="json") for p in providers]
+    await cache.set_cached(cache_key, result, cache.PROVIDERS_TTL)
+    return result
 
 
-@router.get("/providers/{provider_id}", response_model=Provider)
-async def get_provider(provider_id: int, db: Session = Depends(get_db)):
+@router.get("/providers/{provider_id}", response_model=schemas.Provider)
+async def get_provider(provider_id: int, db: AsyncSession = Depends(get_db)):
     """Einzelnen Provider abrufen"""
-    provider = db.query(Provider).filter(Provider.id == provider_id).first()
+    provider = await db.get(Provider, provider_id)
     if not provider:
         raise HTTPException(status_code=404, detail="Provider nicht gefunden")
     return provider
@@ -44,30 +98,29 @@ async def get_prices(
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
     limit: int = Query(100, le=1000),
-    db: Session = Depends(get_db)
+    now: datetime = Depends(get_now),
+    db: AsyncSession = Depends(get_db)
 ):
     """Strompreise abrufen mit Filteroptionen"""
     
     # Standardzeitraum: letzte 24 Stunden
     if not start_time:
-        start_time = datetime.now() - timedelta(hours=24)
+        start_time = now - timedelta(hours=24)
     if not end_time:
-        end_time = datetime.now()
-    
-    # Query aufbauen
-    query = db.query(ElectricPrice).filter(
-        ElectricPrice.timestamp >= start_time,
-        ElectricPrice.timestamp <= end_time
-    )
-    
-    # Provider-Filter
-    if provider_ids:
-        query = query.filter(ElectricPrice.provider_id.in_(provider_ids))
-    
-    # Sortierung und Limit
-    prices = query.order_by(desc(ElectricPrice.timestamp)).limit(limit).all()
-    
-    if not prices:
+        end_time = now
+    
+    # Statistiken über den gesamten Zeitraum direkt in der Datenbank
+    # (lambda_stmt: kompiliertes SQL wird wiederverwendet, nur Parameter wechseln)
+    stats_stmt = _filter_price_range(lambda_stmt(lambda: select(
+        func.avg(ElectricPrice.price_per_kwh),
+        func.min(ElectricPrice.price_per_kwh),
+        func.max(ElectricPrice.price_per_kwh),
+        func.count(ElectricPrice.id)
+    )), start_time, end_time, provider_ids)
+    stats = (await db.execute(stats_stmt)).one()
+    avg_price, min_price, max_price, total_count = stats
+    
+    if not total_count:
         return PriceDataResponse(
             prices=[],
             count=0,
@@ -78,39 +131,54 @@ async def get_prices(
             max_price=0.0
         )
     
-    # Statistiken berechnen
-    price_values = [p.price_per_kwh for p in prices]
-    
-    return PriceDataResponse(
-        prices=prices,
-        count=len(prices),
-        start_time=start_time,
-        end_time=end_time,
-        average_price=round(sum(price_values) / len(price_values), 4),
-        min_price=min(price_values),
-        max_price=max(price_values)
-    )
+    # Sortierung und Limit - raw_data wird nicht mitgeladen
+    prices_stmt = _filter_price_range(lambda_stmt(lambda: select(ElectricPrice).options(
+        PRICE_COLUMNS,
+        joinedload(ElectricPrice.provider)
+    )), start_time, end_time, provider_ids)
+    prices_stmt += lambda s: s.order_by(desc(ElectricPrice.timestamp)).limit(limit)
+    prices = (await db.execute(prices_stmt)).scalars().all()
+    
+    # Direkt serialisieren, FastAPI validiert Response-Objekte nicht erneut
+    price_list = PRICE_LIST_ADAPTER.validate_python(prices, from_attributes=True)
+    return ORJSONResponse({
+        "prices": PRICE_LIST_ADAPTER.dump_python(price_list, mode="json"),
+        "count": len(prices),
+        "start_time": start_time,
+        "end_time": end_time,
+        "average_price": round(avg_price, 4),
+        "min_price": min_price,
+        "max_price": max_price
+    })
 
 
 @router.get("/prices/current")
-async def get_current_prices(db: Session = Depends(get_db)):
+async def get_current_prices(now: datetime = Depends(get_now), db: AsyncSession = Depends(get_db)):
     """Aktuelle Strompreise aller Anbieter"""
-    current_time = datetime.now()
-    
-    # Subquery für die neuesten Preise pro Provider
-    subquery = db.query(
-        ElectricPrice.provider_id,
-        func.max(ElectricPrice.timestamp).label('max_timestamp')
-    ).filter(
-        ElectricPrice.timestamp <= current_time
-    ).group_by(ElectricPrice.provider_id).subquery()
-    
-    # Join mit Haupttabelle um vollständige Datensätze zu erhalten
-    current_prices = db.query(ElectricPrice).join(
-        subquery,
-        (ElectricPrice.provider_id == subquery.c.provider_id) &
-        (ElectricPrice.timestamp == subquery.c.max_timestamp)
-    ).all()
+    cached = await cache.get_cached(cache.CURRENT_PRICES_KEY)
+    if cached is not None:
+        return cached
+    
+    # Neuester Preis pro Provider über ROW_NUMBER (nutzt ix_provider_ts_desc)
+    def current_prices_stmt():
+        subquery = select(
+            ElectricPrice.id,
+            func.row_number().over(
+                partition_by=ElectricPrice.provider_id,
+                order_by=desc(ElectricPrice.timestamp)
+            ).label('rn')
+        ).where(
+            ElectricPrice.timestamp <= now
+        ).subquery()
+        
+        # Join mit Haupttabelle um vollständige Datensätze zu erhalten
+        return select(ElectricPrice).options(
+            joinedload(ElectricPrice.provider)
+        ).join(
+            subquery, ElectricPrice.id == subquery.c.id
+        ).where(subquery.c.rn == 1)
+    
+    current_prices = (await db.execute(lambda_stmt(current_prices_stmt))).scalars().all()
     
     result = []
     for price in current_prices:
@@ -126,6 +194,15 @@ async def get_current_prices(db: Session = Depends(get_db)):
             "market_area": price.market_area
         })
     
+    # Höchstens bis zum Ende des frühesten aktuellen Zeitfensters cachen; danach gilt der nächste Preis,
+    # auch wenn keine Sammlung den Cache invalidiert
+    ttl = cache.CURRENT_PRICES_TTL
+    for price in current_prices:
+        end_time = price.end_time if price.end_time.tzinfo else price.end_time.replace(tzinfo=timezone.utc)
+        if end_time > now:
+            ttl = min(ttl, math.ceil((end_time - now).total_seconds()))
+    
+    await cache.set_cached(cache.CURRENT_PRICES_KEY, result, ttl)
     return result
 
 
@@ -133,17 +210,18 @@ async def get_current_prices(db: Session = Depends(get_db)):
 async def get_price_forecast(
     provider_id: int,
     hours: int = Query(24, le=72),
-    db: Session = Depends(get_db)
+    now: datetime = Depends(get_now),
+    db: AsyncSession = Depends(get_db)
 ):
     """Preisprognose für die nächsten X Stunden"""
-    start_time = datetime.now()
+    start_time = now
     end_time = start_time + timedelta(hours=hours)
     
-    forecast_prices = db.query(ElectricPrice).filter(
+    forecast_prices = (await db.execute(select(ElectricPrice).options(PRICE_COLUMNS).where(
         ElectricPrice.provider_id == provider_id,
         ElectricPrice.start_time >= start_time,
         ElectricPrice.start_time <= end_time
-    ).order_by(asc(ElectricPrice.start_time)).all()
+    ).order_by(asc(ElectricPrice.start_time)))).scalars().all()
     
     return {
         "provider_id": provider_id,
@@ -158,42 +236,59 @@ async def get_cheapest_periods(
     duration_hours: int = Query(1, ge=1, le=12),
     lookhead_hours: int = Query(24, le=72),
     provider_ids: Optional[List[int]] = Query(None),
-    db: Session = Depends(get_db)
+    now: datetime = Depends(get_now),
+    db: AsyncSession = Depends(get_db)
 ):
     """Günstigste Zeiträume finden"""
-    start_time = datetime.now()
+    start_time = now
     end_time = start_time + timedelta(hours=lookhead_hours)
     
-    query = db.query(ElectricPrice).filter(
+    filters = [
         ElectricPrice.start_time >= start_time,
         ElectricPrice.start_time <= end_time
-    )
-    
+    ]
     if provider_ids:
-        query = query.filter(ElectricPrice.provider_id.in_(provider_ids))
-    
-    all_prices = query.order_by(asc(ElectricPrice.start_time)).all()
+        filters.append(ElectricPrice.provider_id.in_(provider_ids))
+    
+    # Sliding Window als Fensterfunktion in der Datenbank berechnen
+    order = (ElectricPrice.start_time, ElectricPrice.id)
+    window = {"order_by": order, "rows": (0, duration_hours - 1)}
+    numbered = select(
+        ElectricPrice.id.label('price_id'),
+        func.row_number().over(order_by=order).label('rn'),
+        func.avg(ElectricPrice.price_per_kwh).over(**window).label('avg_price'),
+        func.count(ElectricPrice.id).over(**window).label('window_size')
+    ).where(*filters).cte('numbered_prices')
+    
+    # Top 10 günstigste Perioden (nur vollständige Fenster)
+    top_windows = (await db.execute(select(numbered.c.rn, numbered.c.avg_price).where(
+        numbered.c.window_size == duration_hours
+    ).order_by(asc(numbered.c.avg_price), asc(numbered.c.rn)).limit(10))).all()
+    
+    if not top_windows:
+        return {"duration_hours": duration_hours, "periods": []}
+    
+    # Nur die Preise der verbleibenden Fenster nachladen
+    needed_rows = {rn + offset for rn, _ in top_windows for offset in range(duration_hours)}
+    window_rows = (await db.execute(select(numbered.c.rn, ElectricPrice).options(PRICE_COLUMNS).join(
+        ElectricPrice, ElectricPrice.id == numbered.c.price_id
+    ).where(numbered.c.rn.in_(needed_rows)))).all()
+    prices_by_rn = {rn: price for rn, price in window_rows}
     
-    # Sliding Window für günstigste Perioden
     cheapest_periods = []
-    for i in range(len(all_prices) - duration_hours + 1):
-        window_prices = all_prices[i:i + duration_hours]
-        if len(window_prices) == duration_hours:
-            avg_price = sum(p.price_per_kwh for p in window_prices) / len(window_prices)
-            cheapest_periods.append({
-                "start_time": window_prices[0].start_time,
-                "end_time": window_prices[-1].end_time,
-                "average_price": round(avg_price, 4),
-                "duration_hours": duration_hours,
-                "prices": window_prices
-            })
-    
-    # Nach Durchschnittspreis sortieren
-    cheapest_periods.sort(key=lambda x: x["average_price"])
+    for rn, avg_price in top_windows:
+        window_prices = [prices_by_rn[rn + offset] for offset in range(duration_hours)]
+        cheapest_periods.append({
+            "start_time": window_prices[0].start_time,
+            "end_time": window_prices[-1].end_time,
+            "average_price": round(avg_price, 4),
+            "duration_hours": duration_hours,
+            "prices": window_prices
+        })
     
     return {
         "duration_hours": duration_hours,
-        "periods": cheapest_periods[:10]  # Top 10 günstigste Perioden
+        "periods": cheapest_periods  # Top 10 günstigste Perioden
     }
 
 
@@ -203,36 +298,49 @@ async def get_price_comparison_data(
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
     provider_ids: Optional[List[int]] = Query(None),
-    db: Session = Depends(get_db)
+    granularity: str = Query("raw", pattern="^(raw|hour)$"),
+    now: datetime = Depends(get_now),
+    db: AsyncSession = Depends(get_db)
 ):
-    """Daten für Preisvergleichsdiagramm"""
+    """Daten für Preisvergleichsdiagramm (granularity=hour liest die Stundenaggregate)"""
     
     if not start_time:
-        start_time = datetime.now() - timedelta(hours=24)
+        start_time = now - timedelta(hours=24)
     if not end_time:
-        end_time = datetime.now()
-    
-    query = db.query(ElectricPrice).filter(
-        ElectricPrice.timestamp >= start_time,
-        ElectricPrice.timestamp <= end_time
-    )
-    
-    if provider_ids:
-        query = query.filter(ElectricPrice.provider_id.in_(provider_ids))
-    
-    prices = query.order_by(asc(ElectricPrice.timestamp)).all()
-    
-    # Nach Providern gruppieren
+        end_time = now
+    
+    if granularity == "hour":
+        # Vorberechnete Stundenmittel statt Rohdaten
+        stmt = select(
+            ElectricPriceHourly.bucket,
+            ElectricPriceHourly.avg_price,
+            Provider.display_name
+        ).join(Provider).where(
+            ElectricPriceHourly.bucket >= start_time,
+            ElectricPriceHourly.bucket <= end_time
+        )
+        if provider_ids:
+            stmt = stmt.where(ElectricPriceHourly.provider_id.in_(provider_ids))
+        stmt = stmt.order_by(asc(Provider.display_name), asc(ElectricPriceHourly.bucket))
+    else:
+        # Nur die benötigten Spalten, sortiert nach Provider und Zeit
+        stmt = _filter_price_range(lambda_stmt(lambda: select(
+            ElectricPrice.timestamp,
+            ElectricPrice.price_per_kwh,
+            Provider.display_name
+        ).join(Provider)), start_time, end_time, provider_ids)
+        stmt += lambda s: s.order_by(asc(Provider.display_name), asc(ElectricPrice.timestamp))
+    
+    # Zeilen in Blöcken streamen statt alle auf einmal zu laden
+    result = await db.stream(stmt, execution_options={"yield_per": 500})
+    
+    # Nach Providern gruppieren - Zeilen kommen bereits sortiert
     datasets = {}
-    for price in prices:
-        provider_name = price.provider.display_name
-        if provider_name not in datasets:
-            datasets[provider_name] = []
-        
-        datasets[provider_name].append({
-            "x": price.timestamp.isoformat(),
-            "y": price.price_per_kwh
-        })
+    async for partition in result.partitions():
+        for provider_name, group in groupby(partition, key=itemgetter(2)):
+            datasets.setdefault(provider_name, []).extend(
+                {"x": timestamp.isoformat(), "y": price} for timestamp, price, _ in group
+            )
     
     return {
         "datasets": datasets,
@@ -246,25 +354,28 @@ async def get_price_comparison_data(
 async def get_daily_average(
     days: int = Query(30, le=365),
     provider_id: Optional[int] = None,
-    db: Session = Depends(get_db)
+    now: datetime = Depends(get_now),
+    db: AsyncSession = Depends(get_db)
 ):
     """Tägliche Durchschnittspreise"""
-    start_date = datetime.now().date() - timedelta(days=days)
+    start_date = now.date() - timedelta(days=days)
+    day = func.date(ElectricPrice.timestamp, type_=Date)
     
-    query = db.query(
-        func.date(ElectricPrice.timestamp).label('date'),
+    stmt = select(
+        day.label('date'),
         func.avg(ElectricPrice.price_per_kwh).label('avg_price'),
         func.min(ElectricPrice.price_per_kwh).label('min_price'),
         func.max(ElectricPrice.price_per_kwh).label('max_price'),
         func.count(ElectricPrice.id).label('count')
-    ).filter(
-        func.date(ElectricPrice.timestamp) >= start_date
+    ).where(
+        # Filter auf der Rohspalte, damit der Index auf timestamp greift
+        ElectricPrice.timestamp >= datetime.combine(start_date, time.min, tzinfo=timezone.utc)
     )
     
     if provider_id:
-        query = query.filter(ElectricPrice.provider_id == provider_id)
+        stmt = stmt.where(ElectricPrice.provider_id == provider_id)
     
-    daily_stats = query.group_by(func.date(ElectricPrice.timestamp)).all()
+    daily_stats = (await db.execute(stmt.group_by(day))).all()
     
     return [
         {
@@ -280,14 +391,16 @@ async def get_daily_average(
 
 # Health Check für Datensammlung
 @router.get("/health/data-collection")
-async def data_collection_health(db: Session = Depends(get_db)):
+async def data_collection_health(db: AsyncSession = Depends(get_db)):
     """Status der Datensammlung prüfen"""
     from ..models import DataCollectionLog
     
     # Letzte Logs pro Provider
-    latest_logs = db.query(DataCollectionLog).order_by(
+    latest_logs = (await db.execute(select(DataCollectionLog).options(
+        joinedload(DataCollectionLog.provider)
+    ).order_by(
         desc(DataCollectionLog.collection_time)
-    ).limit(10).all()
+    ).limit(10))).scalars().all()
     
     provider_status = {}
     for log in latest_logs:
@@ -0,0 +1,46 @@
+from typing import Any, Optional
+import logging
+
+import orjson
+import redis.asyncio as redis
+
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+# Cache-Keys
+CURRENT_PRICES_KEY = "prices:current"
+PROVIDERS_KEY = "providers:{active_only}"
+
+# Lebensdauer der Einträge in Sekunden
+CURRENT_PRICES_TTL = settings.data_collection_interval
+PROVIDERS_TTL = 3600
+
+# Redis Client (Verbindung wird erst beim ersten Zugriff aufgebaut)
+redis_client = redis.from_url(settings.redis_url, socket_connect_timeout=0.5, socket_timeout=0.5)
+
+
+async def get_cached(key: str) -> Optional[Any]:
+    """Wert aus dem Cache lesen, None wenn nicht vorhanden oder Redis nicht erreichbar"""
+    try:
+        cached = await redis_client.get(key)
+    except redis.RedisError as e:
+        logger.debug(f"Redis nicht verfügbar, Cache wird übersprungen: {e}")
+        return None
+    return orjson.loads(cached) if cached is not None else None
+
+
+async def set_cached(key: str, value: Any, ttl: int) -> None:
+    """Wert mit Ablaufzeit im Cache ablegen"""
+    try:
+        await redis_client.setex(key, ttl, orjson.dumps(value))
+    except redis.RedisError as e:
+        logger.debug(f"Redis nicht verfügbar, Cache wird übersprungen: {e}")
+
+
+async def invalidate(*keys: str) -> None:
+    """Cache-Einträge entfernen"""
+    try:
+        await redis_client.delete(*keys)
+    except redis.RedisError as e:
+        logger.debug(f"Redis nicht verfügbar, Cache wird übersprungen: {e}")
@@ -12,9 +12,21 @@ class Settings(BaseSettings):
     awattar_api_key: str = ""
     tibber_api_key: str = ""
     
+    # Connection-Pool (PostgreSQL)
+    db_pool_size: int = 20
+    db_max_overflow: int = 10
+    db_pool_recycle: int = 1800  # Sekunden
+    db_pool_min_size: int = 5  # beim Start vorab geöffnete Verbindungen
+    db_statement_cache_size: int = 500  # Prepared Statements pro asyncpg-Verbindung
+    db_init: bool = True  # Tabellen beim Start anlegen (create_all)
+    
     # Redis
     redis_url: str = "redis://localhost:6379"
     
+    # Server
+    web_workers: int = 1  # >1 teilt Socket.IO-Räume über Redis
+    socketio_redis: bool = False  # Räume über Redis teilen, z.B. bei mehreren Instanzen
+    
     # App Settings
     secret_key: str = "your-secret-key-change-this"
     api_v1_str: str = "/api/v1"
@@ -29,10 +41,13 @@ class Settings(BaseSettings):
     
     # Logging
     log_level: str = "INFO"
+    debug: bool = False  # u.a. Socket.IO/Engine.IO-Logging pro Frame
     
     # Data Collection
     data_collection_interval: int = 900  # 15 minutes
     retention_days: int = 365
+    max_parallel_collectors: int = 4
+    timescale_enabled: bool = False  # electric_prices als TimescaleDB-Hypertable
     
     # Smart Home (Future)
     smart_home_enabled: bool = False
@@ -3,12 +3,21 @@ from typing import List, Dict, Optional, Any
 from datetime import datetime, timedelta
 import asyncio
 import logging
-from sqlalchemy.orm import Session
+import time
+import httpx
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .. import cache
 from ..models import ElectricPrice, Provider, DataCollectionLog
 from ..models.schemas import ElectricPriceCreate
 
 logger = logging.getLogger(__name__)
 
+# Zeilen pro Upsert-Statement (bleibt unter den Parameter-Limits von asyncpg/SQLite)
+UPSERT_BATCH_SIZE = 1000
+
 
 class BaseDataCollector(ABC):
     """Basis-Klasse für alle Datensammler"""
@@ -16,7 +25,25 @@ class BaseDataCollector(ABC):
     def __init__(self, provider_name: str, api_key: Optional[str] = None):
         self.provider_name = provider_name
         self.api_key = api_key
-        self.session = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self.last_status: Optional[str] = None  # Status des letzten collect_and_store
+    
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Wiederverwendeter HTTP-Client (Connection-Pooling, HTTP/2)"""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                http2=True,
+                timeout=30,
+                limits=httpx.Limits(max_keepalive_connections=20, max_connections=50)
+            )
+        return self._client
+    
+    async def aclose(self) -> None:
+        """HTTP-Verbindungen schließen"""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
     
     @abstractmethod
     async def fetch_prices(self, start_time: datetime, end_time: datetime) -> List[Dict[str, Any]]:
@@ -28,19 +55,23 @@ class BaseDataCollector(ABC):
         """Parse die rohen API-Daten zu ElectricPrice-Objekten"""
         pass
     
-    async def collect_and_store(self, db: Session, start_time: datetime, end_time: datetime) -> int:
+    async def collect_and_store(self, db: AsyncSession, start_time: datetime, end_time: datetime) -> int:
         """Sammle Daten und speichere sie in der Datenbank"""
-        collection_start = datetime.now()
+        collection_start = time.perf_counter()
         records_collected = 0
         error_message = None
         status = "success"
+        provider_id = None
         
         try:
             # Provider aus Datenbank holen oder erstellen
-            provider = db.query(Provider).filter(Provider.name == self.provider_name).first()
+            provider = (await db.execute(
+                select(Provider).where(Provider.name == self.provider_name)
+            )).scalars().first()
             if not provider:
                 logger.warning(f"Provider {self.provider_name} nicht gefunden in der Datenbank")
                 return 0
+            provider_id = provider.id
             
             # Daten vom API holen
             raw_data = await self.fetch_prices(start_time, end_time)
@@ -53,48 +84,76 @@ class BaseDataCollector(ABC):
             # Daten parsen
             price_data = self.parse_price_data(raw_data)
             
-            # In Datenbank speichern
-            for price_create in price_data:
-                price_create.provider_id = provider.id
-                
-                # Prüfen ob bereits vorhanden
-                existing = db.query(ElectricPrice).filter(
-                    ElectricPrice.provider_id == provider.id,
-                    ElectricPrice.start_time == price_create.start_time,
-                    ElectricPrice.end_time == price_create.end_time
-                ).first()
-                
-                if not existing:
-                    db_price = ElectricPrice(**price_create.dict())
-                    db.add(db_price)
-                    records_collected += 1
+            # In Datenbank speichern - vorhandene Zeitfenster werden aktualisiert;
+            # taxes/grid_fees immer mitsenden (Basis von total_price, ältere Tabellen haben keinen server_default),
+            # übrige nicht gesetzte Felder füllt die Datenbank
+            rows = [
+                {"taxes": price_create.taxes, "grid_fees": price_create.grid_fees,
+                 **price_create.dict(exclude_unset=True), "provider_id": provider_id}
+                for price_create in price_data
+            ]
+            if rows:
+                records_collected = await self._upsert_prices(db, rows)
             
-            db.commit()
-            logger.info(f"Erfolgreich {records_collected} Preisdatensätze von {self.provider_name} gesammelt")
+            logger.info(f"{self.provider_name}: {len(rows)} Preisdatensätze abgerufen, {records_collected} neu oder geändert")
             
         except Exception as e:
             error_message = str(e)
             status = "error"
             logger.error(f"Fehler beim Sammeln von Daten von {self.provider_name}: {e}")
-            db.rollback()
+            await db.rollback()
         
         finally:
-            # Log-Eintrag erstellen
-            execution_time = int((datetime.now() - collection_start).total_seconds() * 1000)
-            provider = db.query(Provider).filter(Provider.name == self.provider_name).first()
+            # Log-Eintrag in derselben Transaktion wie die Preisdaten
+            execution_time = int((time.perf_counter() - collection_start) * 1000)
             
             log_entry = DataCollectionLog(
-                provider_id=provider.id if provider else None,
+                provider_id=provider_id,
                 status=status,
                 records_collected=records_collected,
                 error_message=error_message,
                 execution_time_ms=execution_time
             )
             db.add(log_entry)
-            db.commit()
+            await db.commit()
+            self.last_status = status
+        
+        if records_collected:
+            await cache.invalidate(cache.CURRENT_PRICES_KEY)
         
         return records_collected
     
+    @staticmethod
+    async def _upsert_prices(db: AsyncSession, rows: List[Dict[str, Any]]) -> int:
+        """Bulk-Upsert über (provider_id, start_time), ein Statement pro Block; liefert neue oder geänderte Zeilen"""
+        # Ein Statement darf jeden Schlüssel nur einmal enthalten (sonst schlägt ON CONFLICT DO UPDATE fehl);
+        # bei Überschneidungen (z.B. ENTSO-E PT60M und PT15M) gewinnt die feinste Auflösung, sonst die letzte Zeile
+        unique_rows: Dict[Any, Dict[str, Any]] = {}
+        for row in rows:
+            key = (row["provider_id"], row["start_time"])
+            kept = unique_rows.get(key)
+            if kept is None or row["end_time"] - row["start_time"] <= kept["end_time"] - kept["start_time"]:
+                unique_rows[key] = row
+        rows = list(unique_rows.values())
+        
+        insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+        columns = ElectricPrice.__table__.c
+        update_columns = [column for column in rows[0] if column not in ("provider_id", "start_time")]
+        affected = 0
+        
+        for offset in range(0, len(rows), UPSERT_BATCH_SIZE):
+            stmt = insert(ElectricPrice).values(rows[offset:offset + UPSERT_BATCH_SIZE])
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["provider_id", "start_time"],
+                set_={column: stmt.excluded[column] for column in update_columns},
+                # Unveränderte Zeilen nicht anfassen: kein Schreibzugriff, zählt nicht als gesammelt
+                where=or_(*(columns[column].is_distinct_from(stmt.excluded[column]) for column in update_columns))
+            )
+            result = await db.execute(stmt)
+            affected += result.rowcount
+        
+        return affected
+    
     def handle_api_error(self, response_code: int, response_text: str) -> None:
         """Handle API-Fehler"""
         if response_code == 401:
@@ -104,8 +163,4 @@ class BaseDataCollector(ABC):
         elif response_code >= 500:
             raise Exception(f"Server-Fehler: {response_code}")
         else:
-            raise Exception(f"API-Fehler {response_code}: {response_text}")
-    
-    def calculate_total_price(self, base_price: float, taxes: float = 0.0, grid_fees: float = 0.0) -> float:
-        """Berechne Gesamtpreis inkl. Steuern und Gebühren"""
-        return round(base_price + taxes + grid_fees, 4)
\ No newline at end of file
+            raise Exception(f"API-Fehler {response_code}: {response_text}")
\ No newline at end of file
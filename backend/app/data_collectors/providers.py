@@ -1,6 +1,9 @@
 import httpx
-import json
-from datetime import datetime, timedelta
+import io
+import orjson
+import re
+from lxml import etree
+from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Any
 from .base import BaseDataCollector
 from ..models.schemas import ElectricPriceCreate, PriceUnit, PriceType
@@ -12,6 +15,16 @@ logger = logging.getLogger(__name__)
 class ENTSOECollector(BaseDataCollector):
     """Datensammler für ENTSO-E Transparency Platform"""
     
+    # Vorkompilierte XPath-Ausdrücke, unabhängig von der Namespace-Version
+    _XPATH_PERIOD_START = etree.XPath("string(*[local-name()='timeInterval']/*[local-name()='start'])")
+    _XPATH_PERIOD_END = etree.XPath("string(*[local-name()='timeInterval']/*[local-name()='end'])")
+    _XPATH_CURVE_TYPE = etree.XPath("string(../*[local-name()='curveType'])")
+    _XPATH_RESOLUTION = etree.XPath("string(*[local-name()='resolution'])")
+    _XPATH_POINTS = etree.XPath("*[local-name()='Point']")
+    _XPATH_POSITION = etree.XPath("number(*[local-name()='position'])")
+    _XPATH_PRICE = etree.XPath("number(*[local-name()='price.amount'])")
+    _RESOLUTION_RE = re.compile(r"PT(\d+)M")
+    
     def __init__(self, api_key: str):
         super().__init__("ENTSO-E", api_key)
         self.base_url = "https://web-api.tp.entsoe.eu/api"
@@ -27,35 +40,54 @@ class ENTSOECollector(BaseDataCollector):
             'periodEnd': end_time.strftime('%Y%m%d%H%M')
         }
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(self.base_url, params=params, timeout=30)
-                
-                if response.status_code != 200:
-                    self.handle_api_error(response.status_code, response.text)
-                
-                # ENTSO-E gibt XML zurück, hier vereinfacht als dict behandelt
-                # In Realität würde man XML parsen
-                return self._parse_xml_response(response.text)
-                
-            except httpx.TimeoutException:
-                raise Exception("ENTSO-E API Timeout")
+        try:
+            response = await self.client.get(self.base_url, params=params)
+            
+            if response.status_code != 200:
+                self.handle_api_error(response.status_code, response.text)
+            
+            # ENTSO-E gibt XML zurück (Publication_MarketDocument)
+            return self._parse_xml_response(response.content)
+            
+        except httpx.TimeoutException:
+            raise Exception("ENTSO-E API Timeout")
     
-    def _parse_xml_response(self, xml_content: str) -> List[Dict[str, Any]]:
-        """Parse ENTSO-E XML Response - vereinfacht"""
-        # Hier würde normalerweise XML geparst werden
-        # Für Demo-Zwecke simulieren wir die Daten
+    def _parse_xml_response(self, xml_content: bytes) -> List[Dict[str, Any]]:
+        """Parse ENTSO-E XML Response (A44) per Streaming über die Period-Elemente"""
         prices = []
-        base_time = datetime.now().replace(minute=0, second=0, microsecond=0)
         
-        for hour in range(24):
-            time_slot = base_time + timedelta(hours=hour)
-            prices.append({
-                'timestamp': time_slot,
-                'price': 50.0 + (hour * 2.5),  # Simulierte Preise
-                'currency': 'EUR',
-                'unit': 'MWh'
-            })
+        for _, period in etree.iterparse(io.BytesIO(xml_content), tag="{*}Period"):
+            period_start = datetime.fromisoformat(self._XPATH_PERIOD_START(period))
+            match = self._RESOLUTION_RE.fullmatch(self._XPATH_RESOLUTION(period))
+            resolution_minutes = int(match.group(1)) if match else 60
+            points = [
+                (int(self._XPATH_POSITION(point)), self._XPATH_PRICE(point))
+                for point in self._XPATH_POINTS(period)
+            ]
+            
+            # Kurventyp A03: Positionen mit unverändertem Preis fehlen, der letzte Wert gilt bis zum Periodenende
+            if self._XPATH_CURVE_TYPE(period) == "A03":
+                period_end = datetime.fromisoformat(self._XPATH_PERIOD_END(period))
+                last_position = (period_end - period_start) // timedelta(minutes=resolution_minutes)
+                points.sort()
+                stops = [position for position, _ in points[1:]] + [last_position + 1]
+                points = [
+                    (position, price)
+                    for (first, price), stop in zip(points, stops)
+                    for position in range(first, stop)
+                ]
+            
+            for position, price in points:
+                prices.append({
+                    'timestamp': period_start + timedelta(minutes=(position - 1) * resolution_minutes),
+                    'price': price,
+                    'currency': 'EUR',
+                    'unit': 'MWh',
+                    'resolution_minutes': resolution_minutes
+                })
+            
+            # Bereits verarbeitete Elemente freigeben
+            period.clear()
         
         return prices
     
@@ -71,14 +103,13 @@ class ENTSOECollector(BaseDataCollector):
             price_obj = ElectricPriceCreate(
                 timestamp=timestamp,
                 start_time=timestamp,
-                end_time=timestamp + timedelta(hours=1),
+                end_time=timestamp + timedelta(minutes=item.get('resolution_minutes', 60)),
                 price_per_kwh=price_ct_kwh,
                 price_unit=PriceUnit.CT_KWH,
                 price_type=PriceType.DAY_AHEAD,
                 market_area="DE-LU",
                 data_source="ENTSO-E",
-                raw_data=json.dumps(item),
-                total_price=price_ct_kwh
+                raw_data=orjson.dumps(item, default=str).decode()
             )
             parsed_prices.append(price_obj)
         
@@ -99,25 +130,24 @@ class AwattarCollector(BaseDataCollector):
             'end': int(end_time.timestamp() * 1000)
         }
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(self.base_url, params=params, timeout=30)
-                
-                if response.status_code != 200:
-                    self.handle_api_error(response.status_code, response.text)
-                
-                return response.json().get('data', [])
-                
-            except httpx.TimeoutException:
-                raise Exception("aWATTar API Timeout")
+        try:
+            response = await self.client.get(self.base_url, params=params)
+            
+            if response.status_code != 200:
+                self.handle_api_error(response.status_code, response.text)
+            
+            return orjson.loads(response.content).get('data', [])
+            
+        except httpx.TimeoutException:
+            raise Exception("aWATTar API Timeout")
     
     def parse_price_data(self, raw_data: List[Dict[str, Any]]) -> List[ElectricPriceCreate]:
         """Parse aWATTar Daten"""
         parsed_prices = []
         
         for item in raw_data:
-            start_timestamp = datetime.fromtimestamp(item['start_timestamp'] / 1000)
-            end_timestamp = datetime.fromtimestamp(item['end_timestamp'] / 1000)
+            start_timestamp = datetime.fromtimestamp(item['start_timestamp'] / 1000, tz=timezone.utc)
+            end_timestamp = datetime.fromtimestamp(item['end_timestamp'] / 1000, tz=timezone.utc)
             
             # aWATTar gibt Preise in EUR/MWh
             price_eur_mwh = item['marketprice']
@@ -126,7 +156,6 @@ class AwattarCollector(BaseDataCollector):
             # Zusätzliche Gebühren (Beispielwerte)
             taxes = 0.64  # ct/kWh (EEG-Umlage etc.)
             grid_fees = 7.5  # ct/kWh (Netzentgelt)
-            total_price = self.calculate_total_price(price_ct_kwh, taxes, grid_fees)
             
             price_obj = ElectricPriceCreate(
                 timestamp=start_timestamp,
@@ -137,10 +166,9 @@ class AwattarCollector(BaseDataCollector):
                 price_type=PriceType.SPOT,
                 taxes=taxes,
                 grid_fees=grid_fees,
-                total_price=total_price,
                 market_area="DE",
                 data_source="aWATTar",
-                raw_data=json.dumps(item)
+                raw_data=orjson.dumps(item, default=str).decode()
             )
             parsed_prices.append(price_obj)
         
@@ -186,35 +214,33 @@ class TibberCollector(BaseDataCollector):
             'Content-Type': 'application/json'
         }
         
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    self.base_url,
-                    json={'query': query},
-                    headers=headers,
-                    timeout=30
-                )
-                
-                if response.status_code != 200:
-                    self.handle_api_error(response.status_code, response.text)
-                
-                data = response.json()
-                
-                # Extract price data from GraphQL response
-                prices = []
-                homes = data.get('data', {}).get('viewer', {}).get('homes', [])
-                
-                for home in homes:
-                    price_info = home.get('currentSubscription', {}).get('priceInfo', {})
-                    
-                    for period in ['today', 'tomorrow']:
-                        if period in price_info:
-                            prices.extend(price_info[period])
-                
-                return prices
+        try:
+            response = await self.client.post(
+                self.base_url,
+                json={'query': query},
+                headers=headers
+            )
+            
+            if response.status_code != 200:
+                self.handle_api_error(response.status_code, response.text)
+            
+            data = orjson.loads(response.content)
+            
+            # Extract price data from GraphQL response
+            prices = []
+            homes = data.get('data', {}).get('viewer', {}).get('homes', [])
+            
+            for home in homes:
+                price_info = home.get('currentSubscription', {}).get('priceInfo', {})
                 
-            except httpx.TimeoutException:
-                raise Exception("Tibber API Timeout")
+                for period in ['today', 'tomorrow']:
+                    if period in price_info:
+                        prices.extend(price_info[period])
+            
+            return prices
+            
+        except httpx.TimeoutException:
+            raise Exception("Tibber API Timeout")
     
     def parse_price_data(self, raw_data: List[Dict[str, Any]]) -> List[ElectricPriceCreate]:
         """Parse Tibber Daten"""
@@ -224,7 +250,7 @@ class TibberCollector(BaseDataCollector):
             if not item.get('startsAt') or not item.get('total'):
                 continue
                 
-            start_time = datetime.fromisoformat(item['startsAt'].replace('Z', '+00:00'))
+            start_time = datetime.fromisoformat(item['startsAt'].replace('Z', '+00:00')).astimezone(timezone.utc)
             end_time = start_time + timedelta(hours=1)
             
             # Tibber gibt Gesamtpreis inkl. aller Steuern und Gebühren
@@ -238,10 +264,9 @@ class TibberCollector(BaseDataCollector):
                 price_per_kwh=price_ct_kwh,
                 price_unit=PriceUnit.CT_KWH,
                 price_type=PriceType.SPOT,
-                total_price=price_ct_kwh,
                 market_area="DE",
                 data_source="Tibber",
-                raw_data=json.dumps(item),
+                raw_data=orjson.dumps(item, default=str).decode(),
                 quality_rating="high"
             )
             parsed_prices.append(price_obj)
@@ -1,18 +1,76 @@
-from sqlalchemy import create_engine, MetaData
+import asyncio
+
+from sqlalchemy import create_engine, event, MetaData
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, StaticPool
 from .config import settings
 
-# Create engine
-engine = create_engine(
-    settings.database_url,
+# Async-Treiber je Datenbank
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+}
+
+is_sqlite = "sqlite" in settings.database_url
+is_sqlite_memory = is_sqlite and (":memory:" in settings.database_url or settings.database_url.rstrip("/") == "sqlite:")
+
+# Engine-Optionen je nach Datenbank
+engine_options = {}
+if is_sqlite:
     # SQLite specific settings
-    connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {}
-)
+    engine_options["connect_args"] = {"check_same_thread": False}
+    if is_sqlite_memory:
+        # In-Memory-DB: alle Sessions teilen sich eine Verbindung
+        engine_options["poolclass"] = StaticPool
+    else:
+        engine_options["pool_size"] = 10
+else:
+    # Begrenzter Pool, tote Verbindungen vor Benutzung erkennen
+    engine_options["pool_size"] = settings.db_pool_size
+    engine_options["max_overflow"] = settings.db_max_overflow
+    engine_options["pool_pre_ping"] = True
+    engine_options["pool_recycle"] = settings.db_pool_recycle
+
+# Create engine
+engine = create_engine(settings.database_url, **engine_options)
+
+# Async engine für die API (gleiche Datenbank, asynchroner Treiber)
+database_url = make_url(settings.database_url)
+async_database_url = database_url.set(drivername=ASYNC_DRIVERS.get(database_url.get_backend_name(), database_url.drivername))
+async_engine_options = dict(engine_options)
+if is_sqlite and not is_sqlite_memory:
+    # aiosqlite nutzt sonst NullPool und öffnet pro Request eine neue Verbindung
+    async_engine_options["poolclass"] = AsyncAdaptedQueuePool
+elif database_url.get_backend_name() == "postgresql":
+    # asyncpg hält wiederkehrende Abfragen (Scheduler, API) als Prepared Statements pro Verbindung
+    async_engine_options["connect_args"] = {"prepared_statement_cache_size": settings.db_statement_cache_size}
+async_engine = create_async_engine(async_database_url, **async_engine_options)
+
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """WAL-Modus und größerer Cache für parallele Leser"""
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA cache_size=-65536")  # 64 MB
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.execute("PRAGMA mmap_size=268435456")  # 256 MB
+    cursor.close()
+
+
+if is_sqlite:
+    event.listen(engine, "connect", _set_sqlite_pragmas)
+    event.listen(async_engine.sync_engine, "connect", _set_sqlite_pragmas)
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async Sessions für FastAPI
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Create Base class
 Base = declarative_base()
 
@@ -20,10 +78,15 @@ Base = declarative_base()
 metadata = MetaData()
 
 
-def get_db():
+async def get_db():
     """Database dependency for FastAPI"""
-    db = SessionLocal()
-    try:
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+
+async def warm_up_pool(size: int = settings.db_pool_min_size) -> None:
+    """Verbindungen vorab öffnen, damit der erste Sammellauf keinen Verbindungsansturm auslöst"""
+    if is_sqlite_memory:
+        return
+    connections = await asyncio.gather(*(async_engine.connect() for _ in range(size)))
+    await asyncio.gather(*(connection.close() for connection in connections))
\ No newline at end of file
@@ -1,7 +1,8 @@
-from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, Index
+from sqlalchemy import Column, Integer, String, Float, DateTime, Text, Boolean, ForeignKey, Index, UniqueConstraint, Computed, event, inspect, text
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
+from ..config import settings
 from ..database import Base
 
 
@@ -41,9 +42,9 @@ class ElectricPrice(Base):
     price_type = Column(String(20), default="spot")  # "spot", "day_ahead", "intraday"
     
     # Zusätzliche Gebühren und Steuern
-    taxes = Column(Float, default=0.0)  # Steuern in ct/kWh
-    grid_fees = Column(Float, default=0.0)  # Netzentgelte
-    total_price = Column(Float)  # Gesamtpreis inkl. aller Abgaben
+    taxes = Column(Float, nullable=False, server_default="0")  # Steuern in ct/kWh
+    grid_fees = Column(Float, nullable=False, server_default="0")  # Netzentgelte
+    total_price = Column(Float, Computed('price_per_kwh + taxes + grid_fees', persisted=True))  # Gesamtpreis inkl. aller Abgaben, von der Datenbank berechnet
     
     # Metadaten
     market_area = Column(String(20))  # z.B. "DE-LU", "AT"
@@ -58,12 +59,131 @@ class ElectricPrice(Base):
     
     # Indexes for performance
     __table_args__ = (
-        Index('ix_provider_timestamp', 'provider_id', 'timestamp'),
+        # neueste Preise zuerst (aktueller Preis, Listen) ohne Sortierschritt;
+        # INCLUDE erlaubt Index-Only-Scans für Dashboard-Abfragen (nur PostgreSQL)
+        Index(
+            'ix_provider_ts_desc', 'provider_id', text('timestamp DESC'),
+            postgresql_include=['price_per_kwh', 'total_price', 'price_unit']
+        ),
         Index('ix_timestamp_price', 'timestamp', 'price_per_kwh'),
+        # Schwellwert-Abfragen der Preisalarme auf dem Gesamtpreis
+        Index('ix_total_price_ts', 'total_price', text('timestamp DESC')),
+        # kompakter BRIN-Index für lange Zeitbereiche (Bereinigung, Aggregate), nur PostgreSQL
+        Index(
+            'ix_prices_ts_brin', 'timestamp',
+            postgresql_using='brin', postgresql_with={'pages_per_range': 32}
+        ).ddl_if(dialect='postgresql'),
         Index('ix_start_end_time', 'start_time', 'end_time'),
+        # Konfliktziel für den Upsert der Collectors, deckt auch Abfragen auf (provider_id, start_time) ab
+        UniqueConstraint('provider_id', 'start_time', name='uq_price_provider_start'),
     )
 
 
+# TimescaleDB: Hypertable nach start_time (Teil aller Unique-Constraints),
+# Kompression älterer Chunks und Retention per drop_chunks statt DELETE
+TIMESCALE_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS timescaledb",
+    "ALTER TABLE electric_prices DROP CONSTRAINT electric_prices_pkey, ADD PRIMARY KEY (id, start_time)",
+    "SELECT create_hypertable('electric_prices', 'start_time', chunk_time_interval => INTERVAL '1 day')",
+    "ALTER TABLE electric_prices SET (timescaledb.compress, timescaledb.compress_segmentby = 'provider_id')",
+    "SELECT add_compression_policy('electric_prices', INTERVAL '7 days')",
+    "SELECT add_retention_policy('electric_prices', INTERVAL '{retention_days} days')",
+]
+
+
+@event.listens_for(ElectricPrice.__table__, "after_create")
+def _create_hypertable(target, connection, **kw):
+    """electric_prices nach dem Anlegen in eine Hypertable umwandeln"""
+    if not settings.timescale_enabled or connection.dialect.name != "postgresql":
+        return
+    
+    for statement in TIMESCALE_DDL:
+        connection.execute(text(statement.format(retention_days=settings.retention_days)))
+
+
+def upgrade_schema(connection) -> None:
+    """Bestehende Datenbanken idempotent an das aktuelle Modell anpassen (nach create_all)"""
+    if connection.dialect.name == "postgresql":
+        # Parallele Starts (Backend, Worker) nacheinander ausführen
+        connection.execute(text("SELECT pg_advisory_xact_lock(hashtext('electric_prices_upgrade'))"))
+    
+    inspector = inspect(connection)
+    if not inspector.has_table("electric_prices"):
+        return
+    
+    # Konfliktziel des Collector-Upserts; ältere Tabellen haben keinen Unique-Constraint
+    existing = {c["name"] for c in inspector.get_unique_constraints("electric_prices")}
+    existing |= {i["name"] for i in inspector.get_indexes("electric_prices") if i.get("unique")}
+    if "uq_price_provider_start" not in existing:
+        # Dubletten entfernen, jeweils die zuletzt gespeicherte Zeile behalten
+        if connection.dialect.name == "postgresql":
+            connection.execute(text(
+                "DELETE FROM electric_prices a USING electric_prices b "
+                "WHERE a.provider_id = b.provider_id AND a.start_time = b.start_time AND a.id < b.id"
+            ))
+            connection.execute(text(
+                "ALTER TABLE electric_prices ADD CONSTRAINT uq_price_provider_start UNIQUE (provider_id, start_time)"
+            ))
+        else:
+            connection.execute(text(
+                "DELETE FROM electric_prices WHERE id NOT IN "
+                "(SELECT MAX(id) FROM electric_prices GROUP BY provider_id, start_time)"
+            ))
+            # SQLite kann Constraints nicht nachträglich anlegen; ein Unique-Index reicht für ON CONFLICT
+            connection.execute(text(
+                "CREATE UNIQUE INDEX uq_price_provider_start ON electric_prices (provider_id, start_time)"
+            ))
+    
+    # total_price als generierte Spalte; ältere Tabellen haben eine normale Spalte, die niemand mehr befüllt
+    total_price = next((c for c in inspector.get_columns("electric_prices") if c["name"] == "total_price"), None)
+    if total_price is not None and not total_price.get("computed"):
+        connection.execute(text("UPDATE electric_prices SET taxes = 0 WHERE taxes IS NULL"))
+        connection.execute(text("UPDATE electric_prices SET grid_fees = 0 WHERE grid_fees IS NULL"))
+        if connection.dialect.name == "postgresql":
+            connection.execute(text(
+                "ALTER TABLE electric_prices "
+                "ALTER COLUMN taxes SET DEFAULT 0, ALTER COLUMN taxes SET NOT NULL, "
+                "ALTER COLUMN grid_fees SET DEFAULT 0, ALTER COLUMN grid_fees SET NOT NULL"
+            ))
+            # abhängige Indizes (ix_total_price_ts, INCLUDE von ix_provider_ts_desc) entfallen mit der Spalte
+            connection.execute(text("ALTER TABLE electric_prices DROP COLUMN total_price"))
+            connection.execute(text(
+                "ALTER TABLE electric_prices ADD COLUMN total_price DOUBLE PRECISION "
+                "GENERATED ALWAYS AS (price_per_kwh + taxes + grid_fees) STORED"
+            ))
+        else:
+            # SQLite: indizierte Spalten lassen sich nicht löschen, nachträglich nur VIRTUAL möglich
+            connection.execute(text("DROP INDEX IF EXISTS ix_total_price_ts"))
+            connection.execute(text("ALTER TABLE electric_prices DROP COLUMN total_price"))
+            connection.execute(text(
+                "ALTER TABLE electric_prices ADD COLUMN total_price FLOAT "
+                "GENERATED ALWAYS AS (price_per_kwh + taxes + grid_fees) VIRTUAL"
+            ))
+    
+    # Modell-Indizes bei jedem Start nachziehen; create_all legt sie nur für neu angelegte Tabellen an
+    for table in (ElectricPrice.__table__, DataCollectionLog.__table__, PriceAlert.__table__):
+        if not inspector.has_table(table.name):
+            continue
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
+
+
+class ElectricPriceHourly(Base):
+    """Stündliche Preisaggregate pro Provider (vom Scheduler aktualisiert)"""
+    __tablename__ = "electric_prices_hourly"
+    
+    provider_id = Column(Integer, ForeignKey("providers.id"), primary_key=True)
+    bucket = Column(DateTime(timezone=True), primary_key=True)  # Beginn der Stunde
+    
+    avg_price = Column(Float, nullable=False)
+    min_price = Column(Float, nullable=False)
+    max_price = Column(Float, nullable=False)
+    data_points = Column(Integer, nullable=False)
+    
+    # Relationships
+    provider = relationship("Provider")
+
+
 class PriceAlert(Base):
     """Preisalarme für günstige Stromzeiten"""
     __tablename__ = "price_alerts"
@@ -78,14 +198,23 @@ class PriceAlert(Base):
     is_active = Column(Boolean, default=True)
     
     # Zeitfenster
-    time_window_hours = Column(Integer, default=24)  # In den nächsten X Stunden
-    min_duration_minutes = Column(Integer, default=60)  # Mindestdauer der günstigen Phase
+    time_window_hours = Column(Integer, server_default="24")  # In den nächsten X Stunden
+    min_duration_minutes = Column(Integer, server_default="60")  # Mindestdauer der günstigen Phase
     
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     last_triggered = Column(DateTime(timezone=True))
     
     # Relationship
     provider = relationship("Provider")
+    
+    # Nur aktive Alarme indizieren - kleiner Index für die Alarmauswertung
+    __table_args__ = (
+        Index(
+            'ix_alerts_active_threshold', 'provider_id', 'threshold_price',
+            postgresql_where=text('is_active = true'),
+            sqlite_where=text('is_active = true')
+        ),
+    )
 
 
 class SmartDevice(Base):
@@ -100,12 +229,12 @@ class SmartDevice(Base):
     # Gerätespezifikationen
     max_power_kw = Column(Float)  # Maximale Leistung in kW
     capacity_kwh = Column(Float)  # Kapazität (für Batterien/EVs)
-    efficiency = Column(Float, default=0.9)  # Wirkungsgrad 0-1
+    efficiency = Column(Float, server_default="0.9")  # Wirkungsgrad 0-1
     
     # Steuerungseinstellungen
     auto_control_enabled = Column(Boolean, default=False)
     min_price_threshold = Column(Float)  # Maximaler Preis für automatisches Laden
-    priority = Column(Integer, default=5)  # Priorität 1-10
+    priority = Column(Integer, server_default="5")  # Priorität 1-10
     
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -121,9 +250,14 @@ class DataCollectionLog(Base):
     
     collection_time = Column(DateTime(timezone=True), server_default=func.now())
     status = Column(String(20))  # "success", "error", "partial"
-    records_collected = Column(Integer, default=0)
+    records_collected = Column(Integer, default=0)  # neue oder geänderte Preiszeilen
     error_message = Column(Text)
     execution_time_ms = Column(Integer)  # Ausführungszeit in Millisekunden
     
     # Relationship
-    provider = relationship("Provider")
\ No newline at end of file
+    provider = relationship("Provider")
+    
+    # Neuester Log je Provider per Rückwärts-Index-Scan (health_check)
+    __table_args__ = (
+        Index('ix_dcl_provider_time_desc', 'provider_id', text('collection_time DESC')),
+    )
\ No newline at end of file
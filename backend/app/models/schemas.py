@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from datetime import datetime
+from pydantic import BaseModel, ConfigDict, Field
+from datetime import datetime, timezone
 from typing import Optional, List
 from enum import Enum
 
@@ -46,8 +46,7 @@ class Provider(ProviderBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # ElectricPrice Schemas
@@ -60,14 +59,13 @@ class ElectricPriceBase(BaseModel):
     price_type: PriceType = PriceType.SPOT
     taxes: float = 0.0
     grid_fees: float = 0.0
-    total_price: Optional[float] = None
     market_area: Optional[str] = None
     quality_rating: Optional[str] = None
     data_source: Optional[str] = None
 
 
 class ElectricPriceCreate(ElectricPriceBase):
-    provider_id: int
+    provider_id: Optional[int] = None  # wird von collect_and_store gesetzt
     raw_data: Optional[str] = None
 
 
@@ -75,10 +73,10 @@ class ElectricPrice(ElectricPriceBase):
     id: int
     provider_id: int
     provider: Provider
+    total_price: Optional[float] = None  # generierte Spalte (price_per_kwh + taxes + grid_fees)
     created_at: datetime
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # PriceAlert Schemas
@@ -102,8 +100,7 @@ class PriceAlert(PriceAlertBase):
     created_at: datetime
     last_triggered: Optional[datetime] = None
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # SmartDevice Schemas
@@ -129,8 +126,7 @@ class SmartDevice(SmartDeviceBase):
     created_at: datetime
     updated_at: Optional[datetime] = None
     
-    class Config:
-        from_attributes = True
+    model_config = ConfigDict(from_attributes=True)
 
 
 # API Response Schemas
@@ -169,7 +165,7 @@ class ChartData(BaseModel):
 class WebSocketMessage(BaseModel):
     type: str  # "price_update", "alert", "status"
     data: dict
-    timestamp: datetime = Field(default_factory=datetime.now)
+    timestamp: datetime = Field(default_factory=lambda: datetime.now(timezone.utc))
 
 
 class LivePriceUpdate(BaseModel):
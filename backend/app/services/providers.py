@@ -0,0 +1,29 @@
+from typing import Any, Dict, List
+import logging
+
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Provider
+
+logger = logging.getLogger(__name__)
+
+# Standard-Provider, die beim Start angelegt werden
+DEFAULT_PROVIDERS = [
+    {"name": "aWATTar", "display_name": "aWATTar", "country_code": "DE", "currency": "EUR"},
+    {"name": "Tibber", "display_name": "Tibber", "country_code": "DE", "currency": "EUR"},
+    {"name": "ENTSO-E", "display_name": "ENTSO-E", "country_code": "DE", "currency": "EUR"},
+]
+
+
+async def ensure_providers(db: AsyncSession, providers: List[Dict[str, Any]]) -> int:
+    """Fehlende Provider in einem Statement anlegen, vorhandene (nach Name) unverändert lassen"""
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    stmt = insert(Provider).values(providers).on_conflict_do_nothing(index_elements=["name"])
+    created = (await db.execute(stmt)).rowcount
+    await db.commit()
+    
+    if created:
+        logger.info(f"{created} Provider angelegt")
+    return created
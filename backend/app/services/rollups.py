@@ -0,0 +1,57 @@
+from datetime import datetime
+from typing import Optional
+import logging
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import ElectricPrice, ElectricPriceHourly
+
+logger = logging.getLogger(__name__)
+
+
+def hour_bucket(column, dialect_name: str):
+    """Zeitstempel auf die volle Stunde abschneiden"""
+    if dialect_name == "postgresql":
+        return func.date_trunc('hour', column)
+    return func.strftime('%Y-%m-%d %H:00:00', column)
+
+
+async def refresh_hourly_prices(db: AsyncSession, since: Optional[datetime] = None) -> int:
+    """Stundenaggregate ab `since` (oder komplett) neu berechnen und per Upsert speichern"""
+    dialect_name = db.get_bind().dialect.name
+    bucket = hour_bucket(ElectricPrice.timestamp, dialect_name)
+    
+    rollup = select(
+        ElectricPrice.provider_id,
+        bucket,
+        func.avg(ElectricPrice.price_per_kwh),
+        func.min(ElectricPrice.price_per_kwh),
+        func.max(ElectricPrice.price_per_kwh),
+        func.count(ElectricPrice.id)
+    ).group_by(ElectricPrice.provider_id, bucket)
+    if since is not None:
+        # Auf volle Stunde abrunden, sonst wird die älteste Stunde nur aus einem Teil ihrer Zeilen neu berechnet
+        since = since.replace(minute=0, second=0, microsecond=0)
+        rollup = rollup.where(ElectricPrice.timestamp >= since)
+    
+    insert = pg_insert if dialect_name == "postgresql" else sqlite_insert
+    stmt = insert(ElectricPriceHourly).from_select(
+        ['provider_id', 'bucket', 'avg_price', 'min_price', 'max_price', 'data_points'],
+        rollup
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=['provider_id', 'bucket'],
+        set_={
+            'avg_price': stmt.excluded.avg_price,
+            'min_price': stmt.excluded.min_price,
+            'max_price': stmt.excluded.max_price,
+            'data_points': stmt.excluded.data_points
+        }
+    )
+    
+    result = await db.execute(stmt)
+    await db.commit()
+    return result.rowcount
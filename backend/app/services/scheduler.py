@@ -1,18 +1,48 @@
 import asyncio
 import logging
-from datetime import datetime, timedelta
-from typing import List
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
 from apscheduler.schedulers.asyncio import AsyncIOScheduler
-from apscheduler.triggers.interval import IntervalTrigger
-from sqlalchemy.orm import Session
+from sqlalchemy import case, delete, func, lambda_stmt, select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..config import settings
-from ..database import SessionLocal
+from ..database import AsyncSessionLocal, warm_up_pool
 from ..data_collectors import ENTSOECollector, AwattarCollector, TibberCollector
-from ..models import Provider
+from ..models import DataCollectionLog, Provider
+from .rollups import refresh_hourly_prices
 
 logger = logging.getLogger(__name__)
 
+# Zeilen pro DELETE-Block bei der Datenbereinigung
+CLEANUP_BATCH_SIZE = 10000
+
+# Zeitraum, der bei jeder Aktualisierung der Stundenaggregate neu berechnet wird
+ROLLUP_REFRESH_WINDOW = timedelta(days=3)
+
+# Exponentieller Backoff für fehlerhafte Collectors
+BACKOFF_INITIAL = timedelta(minutes=1)
+BACKOFF_MAX = timedelta(hours=1)
+
+
+def _recent_collection_stats(since: datetime):
+    """Fehler und Datensätze pro aktivem Provider seit `since` (nutzt ix_dcl_provider_time_desc)"""
+    def build():
+        recent_logs = select(
+            DataCollectionLog.provider_id,
+            func.max(case((DataCollectionLog.status == "error", 1), else_=0)).label('has_error'),
+            func.sum(DataCollectionLog.records_collected).label('records')
+        ).where(
+            DataCollectionLog.collection_time >= since
+        ).group_by(DataCollectionLog.provider_id).subquery()
+        
+        return select(Provider.display_name, recent_logs.c.has_error, recent_logs.c.records).outerjoin(
+            recent_logs, recent_logs.c.provider_id == Provider.id
+        ).where(Provider.is_active == True)
+    
+    # lambda_stmt: SQL wird einmal kompiliert, asyncpg verwendet das Prepared Statement wieder
+    return lambda_stmt(build)
+
 
 class DataCollectionScheduler:
     """Scheduler für automatisierte Datensammlung"""
@@ -21,6 +51,13 @@ class DataCollectionScheduler:
         self.scheduler = AsyncIOScheduler()
         self.collectors = {}
         self.is_running = False
+        self.rollups_initialized = False
+        self._collector_semaphore = asyncio.Semaphore(settings.max_parallel_collectors)
+        self._backoff_until: Dict[str, datetime] = {}
+        self._backoff_delay: Dict[str, timedelta] = {}
+        self._jobs: Dict[str, asyncio.Task] = {}  # laufende Aufgaben je Name
+        self._collection_interval = timedelta(seconds=settings.data_collection_interval)
+        self._next_collection: Optional[datetime] = None
     
     def initialize_collectors(self):
         """Initialisiere alle verfügbaren Datensammler"""
@@ -49,43 +86,16 @@ class DataCollectionScheduler:
         try:
             self.initialize_collectors()
             
-            # Hauptsammlung alle 15 Minuten
-            self.scheduler.add_job(
-                self.collect_all_data,
-                trigger=IntervalTrigger(seconds=settings.data_collection_interval),
-                id='main_collection',
-                name='Hauptdatensammlung',
-                replace_existing=True
-            )
-            
-            # Stündliche Sammlung für Day-Ahead Preise
-            self.scheduler.add_job(
-                self.collect_day_ahead_data,
-                trigger='cron',
-                minute=5,  # 5 Minuten nach jeder Stunde
-                id='day_ahead_collection',
-                name='Day-Ahead Preissammlung',
-                replace_existing=True
-            )
-            
-            # Tägliche Bereinigung alter Daten
-            self.scheduler.add_job(
-                self.cleanup_old_data,
-                trigger='cron',
-                hour=2,  # 2:00 Uhr morgens
-                minute=0,
-                id='data_cleanup',
-                name='Datenbereinigung',
-                replace_existing=True
-            )
-            
-            # Stündliche Gesundheitsprüfung
+            # Ein Job pro Minute startet alle fälligen Aufgaben als eigene Tasks;
+            # lange Läufe blockieren so weder den Takt noch andere Aufgaben
             self.scheduler.add_job(
-                self.health_check,
+                self._tick,
                 trigger='cron',
-                minute=30,  # 30 Minuten nach jeder Stunde
-                id='health_check',
-                name='Gesundheitsprüfung',
+                minute='*',
+                id='scheduler_tick',
+                name='Scheduler-Takt',
+                max_instances=1,
+                coalesce=True,
                 replace_existing=True
             )
             
@@ -107,39 +117,89 @@ class DataCollectionScheduler:
         
         try:
             self.scheduler.shutdown()
+            for job in self._jobs.values():
+                job.cancel()
             self.is_running = False
             logger.info("Data Collection Scheduler gestoppt")
         except Exception as e:
             logger.error(f"Fehler beim Stoppen des Schedulers: {e}")
     
+    async def _tick(self):
+        """Fällige Aufgaben der aktuellen Minute als eigene Tasks starten"""
+        # Ein Zeitpunkt (UTC) für alle Aufgaben dieses Takts
+        now = datetime.now(timezone.utc)
+        
+        # Hauptsammlung im Abstand von data_collection_interval ab dem Start
+        if self._next_collection is None:
+            self._next_collection = now + self._collection_interval
+        elif now >= self._next_collection:
+            self._spawn('collect_all_data', self.collect_all_data, now)
+            while self._next_collection <= now:
+                self._next_collection += self._collection_interval
+        
+        # Stundenaggregate für Diagramme alle 5 Minuten
+        if now.minute % 5 == 0:
+            self._spawn('refresh_price_rollups', self.refresh_price_rollups, now)
+        
+        # Stündliche Sammlung für Day-Ahead Preise, 5 Minuten nach jeder Stunde
+        if now.minute == 5:
+            self._spawn('collect_day_ahead_data', self.collect_day_ahead_data, now)
+        
+        # Stündliche Gesundheitsprüfung, 30 Minuten nach jeder Stunde
+        if now.minute == 30:
+            self._spawn('health_check', self.health_check, now)
+        
+        # Tägliche Bereinigung alter Daten um 2:00 Uhr morgens
+        if now.hour == 2 and now.minute == 0:
+            self._spawn('cleanup_old_data', self.cleanup_old_data, now)
+    
+    def _spawn(self, name: str, job, now: datetime) -> None:
+        """Aufgabe unabhängig vom Takt starten; läuft der vorige Lauf noch, wird nur diese Aufgabe übersprungen"""
+        running = self._jobs.get(name)
+        if running is not None and not running.done():
+            logger.warning(f"{name} läuft noch, Ausführung um {now:%H:%M} wird übersprungen")
+            return
+        self._jobs[name] = asyncio.create_task(job(now), name=name)
+    
+    async def close_collectors(self):
+        """HTTP-Clients aller Collectors schließen"""
+        await asyncio.gather(
+            *(collector.aclose() for collector in self.collectors.values()),
+            return_exceptions=True
+        )
+    
     async def initial_data_collection(self):
         """Erste Datensammlung beim Start"""
         logger.info("Starte initiale Datensammlung...")
+        try:
+            await warm_up_pool()
+        except Exception as e:
+            logger.warning(f"Connection-Pool konnte nicht vorgewärmt werden: {e}")
         await asyncio.sleep(5)  # Kurz warten nach dem Start
         await self.collect_all_data()
+        await self.refresh_price_rollups()
     
-    async def collect_all_data(self):
+    async def collect_all_data(self, now: Optional[datetime] = None):
         """Sammle Daten von allen verfügbaren Quellen"""
         logger.info("Starte Datensammlung von allen Quellen")
+        now = now or datetime.now(timezone.utc)
         
         # Zeitfenster: letzte 2 Stunden bis in 48 Stunden
-        start_time = datetime.now() - timedelta(hours=2)
-        end_time = datetime.now() + timedelta(hours=48)
+        start_time = now - timedelta(hours=2)
+        end_time = now + timedelta(hours=48)
         
-        db = SessionLocal()
         total_collected = 0
         
         try:
-            # Parallel alle Collector ausführen
-            tasks = []
-            for collector_name, collector in self.collectors.items():
-                tasks.append(self._collect_from_source(collector, db, start_time, end_time))
-            
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            # Parallel alle Collector ausführen, jeder mit eigener Session
+            collector_items = tuple(self.collectors.items())
+            results = await asyncio.gather(
+                *(self._collect_from_source(collector, start_time, end_time, now) for _, collector in collector_items),
+                return_exceptions=True
+            )
             
             # Ergebnisse auswerten
-            for i, result in enumerate(results):
-                collector_name = list(self.collectors.keys())[i]
+            for (collector_name, _), result in zip(collector_items, results):
                 if isinstance(result, Exception):
                     logger.error(f"Fehler bei {collector_name}: {result}")
                 else:
@@ -150,26 +210,51 @@ class DataCollectionScheduler:
             
         except Exception as e:
             logger.error(f"Fehler bei der Datensammlung: {e}")
-        finally:
-            db.close()
     
-    async def _collect_from_source(self, collector, db: Session, start_time: datetime, end_time: datetime) -> int:
+    async def _collect_from_source(self, collector, start_time: datetime, end_time: datetime, now: datetime) -> int:
         """Sammle Daten von einer spezifischen Quelle"""
-        try:
-            return await collector.collect_and_store(db, start_time, end_time)
-        except Exception as e:
-            logger.error(f"Fehler bei Collector {collector.provider_name}: {e}")
+        name = collector.provider_name
+        if name in self._backoff_until and now < self._backoff_until[name]:
+            logger.info(f"{name} wird bis {self._backoff_until[name]:%H:%M} übersprungen (Backoff)")
             return 0
+        
+        async with self._collector_semaphore:
+            # Eigene Session pro Collector - Sessions sind nicht nebenläufig nutzbar
+            db = AsyncSessionLocal()
+            try:
+                collected = await collector.collect_and_store(db, start_time, end_time)
+                failed = collector.last_status == "error"
+            except Exception as e:
+                logger.error(f"Fehler bei Collector {name}: {e}")
+                collected, failed = 0, True
+            finally:
+                await db.close()
+        
+        self._update_backoff(name, failed, now)
+        return collected
+    
+    def _update_backoff(self, name: str, failed: bool, now: datetime) -> None:
+        """Wartezeit nach Fehlern verdoppeln (max. 1h), nach Erfolg zurücksetzen"""
+        if not failed:
+            self._backoff_until.pop(name, None)
+            self._backoff_delay.pop(name, None)
+            return
+        
+        delay = min(self._backoff_delay.get(name, BACKOFF_INITIAL / 2) * 2, BACKOFF_MAX)
+        self._backoff_delay[name] = delay
+        self._backoff_until[name] = now + delay
+        logger.warning(f"{name}: nächster Versuch frühestens in {delay}")
     
-    async def collect_day_ahead_data(self):
+    async def collect_day_ahead_data(self, now: Optional[datetime] = None):
         """Sammle spezifisch Day-Ahead Preise (täglich um ca. 14:00 verfügbar)"""
         logger.info("Sammle Day-Ahead Preise")
+        now = now or datetime.now(timezone.utc)
         
         # Morgen und übermorgen
-        tomorrow = (datetime.now() + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+        tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
         day_after = tomorrow + timedelta(days=1)
         
-        db = SessionLocal()
+        db = AsyncSessionLocal()
         
         try:
             # Nur ENTSO-E für Day-Ahead Preise
@@ -181,70 +266,95 @@ class DataCollectionScheduler:
         except Exception as e:
             logger.error(f"Fehler bei Day-Ahead Sammlung: {e}")
         finally:
-            db.close()
+            await db.close()
     
-    async def cleanup_old_data(self):
+    async def refresh_price_rollups(self, now: Optional[datetime] = None):
+        """Stundenaggregate aktualisieren (beim ersten Lauf vollständig)"""
+        since = None if not self.rollups_initialized else (now or datetime.now(timezone.utc)) - ROLLUP_REFRESH_WINDOW
+        db = AsyncSessionLocal()
+        
+        try:
+            updated = await refresh_hourly_prices(db, since)
+            self.rollups_initialized = True
+            logger.debug(f"Stundenaggregate aktualisiert: {updated} Buckets")
+        except Exception as e:
+            logger.error(f"Fehler beim Aktualisieren der Stundenaggregate: {e}")
+            await db.rollback()
+        finally:
+            await db.close()
+    
+    async def cleanup_old_data(self, now: Optional[datetime] = None):
         """Bereinige alte Daten basierend auf Retention Policy"""
         logger.info("Starte Datenbereinigung")
+        now = now or datetime.now(timezone.utc)
         
-        cutoff_date = datetime.now() - timedelta(days=settings.retention_days)
-        db = SessionLocal()
+        cutoff_date = now - timedelta(days=settings.retention_days)
+        db = AsyncSessionLocal()
         
         try:
             from ..models import ElectricPrice, DataCollectionLog
             
-            # Alte Preisdaten löschen
-            deleted_prices = db.query(ElectricPrice).filter(
-                ElectricPrice.timestamp < cutoff_date
-            ).delete()
+            # Alte Preisdaten löschen (bei TimescaleDB übernimmt das die Retention Policy)
+            deleted_prices = 0
+            if not settings.timescale_enabled:
+                deleted_prices = await self._delete_in_batches(
+                    db, ElectricPrice, ElectricPrice.timestamp < cutoff_date
+                )
             
             # Alte Logs löschen (nur ältere als 90 Tage)
-            log_cutoff = datetime.now() - timedelta(days=90)
-            deleted_logs = db.query(DataCollectionLog).filter(
-                DataCollectionLog.collection_time < log_cutoff
-            ).delete()
-            
-            db.commit()
+            log_cutoff = now - timedelta(days=90)
+            deleted_logs = await self._delete_in_batches(
+                db, DataCollectionLog, DataCollectionLog.collection_time < log_cutoff
+            )
             
             logger.info(f"Datenbereinigung abgeschlossen: {deleted_prices} Preisdaten und {deleted_logs} Logs gelöscht")
             
         except Exception as e:
             logger.error(f"Fehler bei der Datenbereinigung: {e}")
-            db.rollback()
+            await db.rollback()
         finally:
-            db.close()
+            await db.close()
     
-    async def health_check(self):
+    @staticmethod
+    async def _delete_in_batches(db: AsyncSession, model, condition) -> int:
+        """Zeilen blockweise löschen und nach jedem Block committen (kurze Locks)"""
+        total_deleted = 0
+        
+        while True:
+            batch_ids = select(model.id).where(condition).limit(CLEANUP_BATCH_SIZE).scalar_subquery()
+            result = await db.execute(
+                delete(model).where(model.id.in_(batch_ids)).execution_options(synchronize_session=False)
+            )
+            await db.commit()
+            total_deleted += result.rowcount
+            
+            if result.rowcount < CLEANUP_BATCH_SIZE:
+                return total_deleted
+    
+    async def health_check(self, now: Optional[datetime] = None):
         """Überprüfe Gesundheit der Datensammlung"""
         logger.info("Führe Gesundheitsprüfung durch")
+        now = now or datetime.now(timezone.utc)
         
-        db = SessionLocal()
+        db = AsyncSessionLocal()
         
         try:
-            from ..models import DataCollectionLog, Provider
-            
-            # Prüfe letzte Datensammlung pro Provider
-            one_hour_ago = datetime.now() - timedelta(hours=1)
-            
-            providers = db.query(Provider).filter(Provider.is_active == True).all()
+            # Prüfe letzte Datensammlung pro Provider (ein Aggregat über die letzte Stunde)
+            one_hour_ago = now - timedelta(hours=1)
+            rows = (await db.execute(_recent_collection_stats(one_hour_ago))).all()
             
-            for provider in providers:
-                latest_log = db.query(DataCollectionLog).filter(
-                    DataCollectionLog.provider_id == provider.id,
-                    DataCollectionLog.collection_time >= one_hour_ago
-                ).order_by(DataCollectionLog.collection_time.desc()).first()
-                
-                if not latest_log:
-                    logger.warning(f"Keine aktuellen Daten für {provider.display_name}")
-                elif latest_log.status == "error":
-                    logger.warning(f"Sammelfehler bei {provider.display_name}: {latest_log.error_message}")
+            for provider_name, has_error, records in rows:
+                if has_error is None:
+                    logger.warning(f"Keine aktuellen Daten für {provider_name}")
+                elif has_error:
+                    logger.warning(f"Sammelfehler bei {provider_name} in der letzten Stunde")
                 else:
-                    logger.debug(f"{provider.display_name}: OK ({latest_log.records_collected} Datensätze)")
+                    logger.debug(f"{provider_name}: OK ({records} Datensätze)")
             
         except Exception as e:
             logger.error(f"Fehler bei der Gesundheitsprüfung: {e}")
         finally:
-            db.close()
+            await db.close()
     
     def get_status(self) -> dict:
         """Gebe aktuellen Status des Schedulers zurück"""
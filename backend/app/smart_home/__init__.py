@@ -6,8 +6,10 @@ Aktuell nur als Platzhalter und Architektur-Vorlage implementiert.
 """
 
 from abc import ABC, abstractmethod
+from collections import defaultdict
 from typing import Dict, List, Optional, Any
-from datetime import datetime
+from datetime import datetime, timezone
+import asyncio
 import logging
 import json
 
@@ -17,12 +19,23 @@ logger = logging.getLogger(__name__)
 class SmartHomeDevice(ABC):
     """Basis-Klasse für Smart Home Geräte"""
     
+    __slots__ = ("device_id", "name", "device_type", "is_available", "last_updated", "_status_template")
+    
     def __init__(self, device_id: str, name: str, device_type: str):
         self.device_id = device_id
         self.name = name
         self.device_type = device_type
         self.is_available = False
-        self.last_updated = datetime.now()
+        self.last_updated = datetime.now(timezone.utc)
+        self._status_template: Dict[str, Any] = {
+            "device_id": device_id,
+            "name": name,
+            "type": device_type
+        }
+    
+    def _touch(self, now: Optional[datetime] = None):
+        """Zeitpunkt der letzten Änderung setzen (Controller übergibt einen gemeinsamen Zeitpunkt)"""
+        self.last_updated = now or datetime.now(timezone.utc)
     
     @abstractmethod
     async def get_status(self) -> Dict[str, Any]:
@@ -30,7 +43,7 @@ class SmartHomeDevice(ABC):
         pass
     
     @abstractmethod
-    async def set_power_state(self, state: bool) -> bool:
+    async def set_power_state(self, state: bool, now: Optional[datetime] = None) -> bool:
         """Gerät ein-/ausschalten"""
         pass
     
@@ -43,33 +56,32 @@ class SmartHomeDevice(ABC):
 class BatteryStorage(SmartHomeDevice):
     """Batteriespeicher für Smart Home Integration"""
     
+    __slots__ = ("capacity_kwh", "max_power_kw", "current_soc", "is_charging")
+    
     def __init__(self, device_id: str, name: str, capacity_kwh: float, max_power_kw: float):
         super().__init__(device_id, name, "battery")
         self.capacity_kwh = capacity_kwh
         self.max_power_kw = max_power_kw
         self.current_soc = 0.0  # State of Charge (0-100%)
         self.is_charging = False
+        self._status_template.update(capacity_kwh=capacity_kwh, max_power_kw=max_power_kw)
     
     async def get_status(self) -> Dict[str, Any]:
-        """Batteriespeicher-Status"""
+        """Batteriespeicher-Status (feste Felder aus der Vorlage, nur veränderliche neu)"""
         return {
-            "device_id": self.device_id,
-            "name": self.name,
-            "type": self.device_type,
+            **self._status_template,
             "available": self.is_available,
             "soc_percent": self.current_soc,
-            "capacity_kwh": self.capacity_kwh,
-            "max_power_kw": self.max_power_kw,
             "is_charging": self.is_charging,
-            "last_updated": self.last_updated.isoformat()
+            "last_updated": self.last_updated
         }
     
-    async def set_power_state(self, state: bool) -> bool:
+    async def set_power_state(self, state: bool, now: Optional[datetime] = None) -> bool:
         """Laden starten/stoppen"""
         # Hier würde die tatsächliche Gerätesteuerung implementiert
         logger.info(f"Batteriespeicher {self.name}: {'Laden gestartet' if state else 'Laden gestoppt'}")
         self.is_charging = state
-        self.last_updated = datetime.now()
+        self._touch(now)
         return True
     
     async def get_power_consumption(self) -> float:
@@ -92,27 +104,27 @@ class BatteryStorage(SmartHomeDevice):
 class EVCharger(SmartHomeDevice):
     """Elektroauto-Ladestation"""
     
+    __slots__ = ("max_power_kw", "is_connected", "is_charging", "current_power")
+    
     def __init__(self, device_id: str, name: str, max_power_kw: float):
         super().__init__(device_id, name, "ev_charger")
         self.max_power_kw = max_power_kw
         self.is_connected = False
         self.is_charging = False
         self.current_power = 0.0
+        self._status_template.update(max_power_kw=max_power_kw)
     
     async def get_status(self) -> Dict[str, Any]:
         return {
-            "device_id": self.device_id,
-            "name": self.name,
-            "type": self.device_type,
+            **self._status_template,
             "available": self.is_available,
             "connected": self.is_connected,
             "charging": self.is_charging,
-            "max_power_kw": self.max_power_kw,
             "current_power_kw": self.current_power,
-            "last_updated": self.last_updated.isoformat()
+            "last_updated": self.last_updated
         }
     
-    async def set_power_state(self, state: bool) -> bool:
+    async def set_power_state(self, state: bool, now: Optional[datetime] = None) -> bool:
         if not self.is_connected:
             logger.warning(f"EV Charger {self.name}: Kein Fahrzeug angeschlossen")
             return False
@@ -120,7 +132,7 @@ class EVCharger(SmartHomeDevice):
         logger.info(f"EV Charger {self.name}: {'Laden gestartet' if state else 'Laden gestoppt'}")
         self.is_charging = state
         self.current_power = self.max_power_kw if state else 0.0
-        self.last_updated = datetime.now()
+        self._touch(now)
         return True
     
     async def get_power_consumption(self) -> float:
@@ -130,6 +142,8 @@ class EVCharger(SmartHomeDevice):
 class HeatPump(SmartHomeDevice):
     """Wärmepumpe mit Smart Grid Funktionalität"""
     
+    __slots__ = ("max_power_kw", "is_running", "target_temperature", "current_temperature", "smart_grid_mode")
+    
     def __init__(self, device_id: str, name: str, max_power_kw: float):
         super().__init__(device_id, name, "heat_pump")
         self.max_power_kw = max_power_kw
@@ -137,25 +151,23 @@ class HeatPump(SmartHomeDevice):
         self.target_temperature = 21.0
         self.current_temperature = 20.0
         self.smart_grid_mode = False
+        self._status_template.update(max_power_kw=max_power_kw)
     
     async def get_status(self) -> Dict[str, Any]:
         return {
-            "device_id": self.device_id,
-            "name": self.name,
-            "type": self.device_type,
+            **self._status_template,
             "available": self.is_available,
             "running": self.is_running,
-            "max_power_kw": self.max_power_kw,
             "target_temperature": self.target_temperature,
             "current_temperature": self.current_temperature,
             "smart_grid_mode": self.smart_grid_mode,
-            "last_updated": self.last_updated.isoformat()
+            "last_updated": self.last_updated
         }
     
-    async def set_power_state(self, state: bool) -> bool:
+    async def set_power_state(self, state: bool, now: Optional[datetime] = None) -> bool:
         logger.info(f"Heat Pump {self.name}: {'Ein' if state else 'Aus'}geschaltet")
         self.is_running = state
-        self.last_updated = datetime.now()
+        self._touch(now)
         return True
     
     async def get_power_consumption(self) -> float:
@@ -172,41 +184,55 @@ class SmartHomeController:
     
     def __init__(self):
         self.devices: Dict[str, SmartHomeDevice] = {}
+        self.devices_by_type: Dict[str, List[SmartHomeDevice]] = defaultdict(list)  # z.B. "battery" -> [...]
         self.is_enabled = False
         self.automation_rules: List[Dict] = []
     
     def register_device(self, device: SmartHomeDevice):
         """Gerät registrieren"""
+        self.unregister_device(device.device_id)
         self.devices[device.device_id] = device
+        self.devices_by_type[device.device_type].append(device)
         logger.info(f"Smart Home Gerät registriert: {device.name} ({device.device_type})")
     
     def unregister_device(self, device_id: str):
         """Gerät entfernen"""
         if device_id in self.devices:
             device = self.devices.pop(device_id)
+            self.devices_by_type[device.device_type].remove(device)
             logger.info(f"Smart Home Gerät entfernt: {device.name}")
     
     async def get_all_devices(self) -> List[Dict[str, Any]]:
-        """Status aller Geräte abrufen"""
+        """Status aller Geräte abrufen (parallel)"""
+        devices = list(self.devices.values())
+        results = await asyncio.gather(
+            *(device.get_status() for device in devices),
+            return_exceptions=True
+        )
+        
         devices_status = []
-        for device in self.devices.values():
-            try:
-                status = await device.get_status()
-                devices_status.append(status)
-            except Exception as e:
-                logger.error(f"Fehler beim Abrufen des Status von {device.name}: {e}")
+        for device, result in zip(devices, results):
+            if isinstance(result, Exception):
+                logger.error(f"Fehler beim Abrufen des Status von {device.name}: {result}")
+            else:
+                devices_status.append(result)
         
         return devices_status
     
     async def get_total_power_consumption(self) -> float:
-        """Gesamter aktueller Stromverbrauch aller Geräte"""
+        """Gesamter aktueller Stromverbrauch aller Geräte (parallel abgefragt)"""
+        devices = list(self.devices.values())
+        results = await asyncio.gather(
+            *(device.get_power_consumption() for device in devices),
+            return_exceptions=True
+        )
+        
         total_power = 0.0
-        for device in self.devices.values():
-            try:
-                power = await device.get_power_consumption()
-                total_power += power
-            except Exception as e:
-                logger.error(f"Fehler beim Abrufen des Verbrauchs von {device.name}: {e}")
+        for device, result in zip(devices, results):
+            if isinstance(result, Exception):
+                logger.error(f"Fehler beim Abrufen des Verbrauchs von {device.name}: {result}")
+            else:
+                total_power += result
         
         return total_power
     
@@ -219,36 +245,42 @@ class SmartHomeController:
         if not self.is_enabled:
             return {"status": "disabled", "actions": []}
         
+        now = datetime.now(timezone.utc)  # gemeinsamer Zeitpunkt für alle Geräte
         actions = []
+        commands = []  # (Gerät, Befehl) - werden am Ende parallel gesendet
         
         # Beispiel-Logik für Batteriespeicher
-        for device in self.devices.values():
-            if isinstance(device, BatteryStorage):
-                # Bei niedrigen Preisen laden
-                if current_price < 20.0 and device.current_soc < 80.0:
-                    await device.set_power_state(True)
-                    actions.append(f"Batteriespeicher {device.name} lädt bei günstigem Preis")
-                
-                # Bei hohen Preisen entladen (wenn Bedarf vorhanden)
-                elif current_price > 30.0 and device.current_soc > 20.0:
-                    await device.set_power_state(False)
-                    actions.append(f"Batteriespeicher {device.name} pausiert bei hohem Preis")
+        for device in self.devices_by_type["battery"]:
+            # Bei niedrigen Preisen laden
+            if current_price < 20.0 and device.current_soc < 80.0:
+                commands.append((device, device.set_power_state(True, now)))
+                actions.append(f"Batteriespeicher {device.name} lädt bei günstigem Preis")
+            
+            # Bei hohen Preisen entladen (wenn Bedarf vorhanden)
+            elif current_price > 30.0 and device.current_soc > 20.0:
+                commands.append((device, device.set_power_state(False, now)))
+                actions.append(f"Batteriespeicher {device.name} pausiert bei hohem Preis")
         
         # Beispiel-Logik für Wärmepumpe
-        for device in self.devices.values():
-            if isinstance(device, HeatPump) and device.smart_grid_mode:
+        for device in self.devices_by_type["heat_pump"]:
+            if device.smart_grid_mode:
                 # Bei sehr niedrigen Preisen vorheizen
                 if current_price < 15.0 and device.current_temperature < device.target_temperature:
-                    await device.set_power_state(True)
+                    commands.append((device, device.set_power_state(True, now)))
                     actions.append(f"Wärmepumpe {device.name} heizt vor bei günstigem Preis")
         
+        results = await asyncio.gather(*(command for _, command in commands), return_exceptions=True)
+        for (device, _), result in zip(commands, results):
+            if isinstance(result, Exception):
+                logger.error(f"Fehler beim Schalten von {device.name}: {result}")
+        
         logger.info(f"Preisoptimierung durchgeführt: {len(actions)} Aktionen")
         
         return {
             "status": "optimized",
             "current_price": current_price,
             "actions": actions,
-            "timestamp": datetime.now().isoformat()
+            "timestamp": now
         }
     
     def add_automation_rule(self, rule: Dict[str, Any]):
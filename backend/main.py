@@ -1,13 +1,55 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Query
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response, StreamingResponse
+from datetime import datetime, timedelta
+from functools import lru_cache
 import logging
+import numpy as np
+import orjson
 
 # Setup
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Electric Price Tracker")
+# Feste Demo-Provider, einmal serialisiert
+PROVIDERS = (
+    {"id": 1, "name": "aWATTar", "display_name": "aWATTar", "country_code": "DE"},
+    {"id": 2, "name": "Tibber", "display_name": "Tibber", "country_code": "DE"},
+    {"id": 3, "name": "ENTSO-E", "display_name": "ENTSO-E", "country_code": "DE"},
+)
+_PROVIDERS_JSON = orjson.dumps(PROVIDERS)
+
+# Zufallsgenerator für ungeseedete Demo-Werte (reproduzierbare Verläufe nutzen eigene Generatoren)
+_RNG = np.random.default_rng()
+
+# Sonnenzeiten für Deutschland
+SUNRISE_HOUR = 7.0
+SUNSET_HOUR = 19.0
+
+# Lookup-Tabellen für die Demo-Daten (Index: Stunde 0-23, Monat - 1, Wochentag Mo=0)
+_HOURS = np.arange(24)
+_SOLAR_FACTOR = np.where(  # Sonnenstand-basierte Preismodulation
+    (_HOURS >= SUNRISE_HOUR) & (_HOURS <= SUNSET_HOUR),
+    1 + np.sin((_HOURS - SUNRISE_HOUR) / (SUNSET_HOUR - SUNRISE_HOUR) * np.pi) * 0.3,
+    0.7
+)
+_SEASONAL = np.array([1.2, 1.2, 1.0, 1.0, 1.0, 0.9, 0.9, 0.9, 1.0, 1.0, 1.0, 1.2])  # Winter teurer
+_WEEKDAY = np.array([1.0, 1.0, 1.0, 1.0, 1.0, 0.9, 0.9])  # Wochenende günstiger
+
+# Tagesmittel: Basispreis und Schwankungsbreite je Stunde (Morgen-, Solar-, Abend-Peak, Nacht)
+_DAY_PERIODS = [
+    (_HOURS >= 6) & (_HOURS <= 8),
+    (_HOURS >= 11) & (_HOURS <= 15),
+    (_HOURS >= 18) & (_HOURS <= 21),
+    (_HOURS >= 22) | (_HOURS <= 5),
+]
+_HOUR_BASE_PRICE = np.select(_DAY_PERIODS, [28, 32, 30, 18], 24)
+_HOUR_NOISE_LOW = np.select(_DAY_PERIODS, [-2, -1, -2, -1], -2)
+_HOUR_NOISE_HIGH = np.select(_DAY_PERIODS, [3, 5, 4, 2], 3)
+_DAILY_SEASONAL = np.array([1.15, 1.15, 1.0, 1.0, 1.0, 0.95, 0.95, 0.95, 1.0, 1.0, 1.0, 1.15])
+_DAILY_WEEKDAY = np.array([1.0, 1.0, 1.0, 1.0, 1.0, 0.85, 0.85])
+
+app = FastAPI(title="Electric Price Tracker", default_response_class=ORJSONResponse)
 
 # CORS
 app.add_middleware(
@@ -16,13 +58,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=86400,  # Preflight-Antworten einen Tag im Browser cachen
 )
 
+# Frontend wird einmal gelesen und danach aus dem Speicher ausgeliefert
+_index_html = None
+
 # Simple Routes
 @app.get("/")
 async def root():
-    with open("frontend/index.html", "r") as f:
-        return HTMLResponse(f.read())
+    global _index_html
+    if _index_html is None:
+        with open("frontend/index.html", "rb") as f:
+            _index_html = f.read()
+    return HTMLResponse(_index_html)
 
 @app.get("/health")
 async def health():
@@ -30,32 +79,28 @@ async def health():
 
 @app.get("/api/v1/providers")
 async def providers():
-    return [
-        {"id": 1, "name": "aWATTar", "display_name": "aWATTar", "country_code": "DE"},
-        {"id": 2, "name": "Tibber", "display_name": "Tibber", "country_code": "DE"},
-        {"id": 3, "name": "ENTSO-E", "display_name": "ENTSO-E", "country_code": "DE"}
-    ]
+    return Response(content=_PROVIDERS_JSON, media_type="application/json")
 
 @app.get("/api/v1/prices/current")
 async def current_prices():
-    import random
+    current, total = (np.array([[20, 22, 18], [25, 27, 23]]) + _RNG.random((2, 3)) * [10, 8, 12]).round(2).tolist()
     return [
         {
             "provider": {"id": 1, "name": "aWATTar"},
-            "current_price": round(20 + random.random() * 10, 2),
-            "total_price": round(25 + random.random() * 10, 2),
+            "current_price": current[0],
+            "total_price": total[0],
             "timestamp": "2025-09-26T18:00:00"
         },
         {
             "provider": {"id": 2, "name": "Tibber"}, 
-            "current_price": round(22 + random.random() * 8, 2),
-            "total_price": round(27 + random.random() * 8, 2),
+            "current_price": current[1],
+            "total_price": total[1],
             "timestamp": "2025-09-26T18:00:00"
         },
         {
             "provider": {"id": 3, "name": "ENTSO-E"}, 
-            "current_price": round(18 + random.random() * 12, 2),
-            "total_price": round(23 + random.random() * 12, 2),
+            "current_price": current[2],
+            "total_price": total[2],
             "timestamp": "2025-09-26T18:00:00"
         }
     ]
@@ -63,14 +108,47 @@ async def current_prices():
 @app.get("/api/v1/charts/price-comparison")
 async def chart_data(
     time_range: str = "24h",
-    provider_ids: str = None  # Comma-separated string
+    provider_ids: str = None,  # Comma-separated string
+    response_format: str = Query("json", alias="format", pattern="^(json|ndjson)$")
 ):
-    import random
-    from datetime import datetime, timedelta
-    import math
+    # Provider filtern
+    all_providers = [provider["name"] for provider in PROVIDERS]
+    if provider_ids:
+        # Parse comma-separated string to list of integers
+        try:
+            id_list = [int(id.strip()) for id in provider_ids.split(',') if id.strip()]
+            provider_map = {provider["id"]: provider["name"] for provider in PROVIDERS}
+            selected_providers = [provider_map.get(id) for id in id_list if id in provider_map]
+            providers = [p for p in selected_providers if p]
+        except (ValueError, AttributeError):
+            providers = all_providers
+    else:
+        providers = all_providers
     
-    now = datetime.now()
+    # Innerhalb einer Stunde identische Antwort - fertig serialisiert aus dem Cache
+    bucket = datetime.now().replace(minute=0, second=0, microsecond=0)
+    
+    # Optional als NDJSON: erst Metadaten, dann eine Zeile pro Provider, jeweils erst beim Senden berechnet
+    if response_format == "ndjson":
+        return StreamingResponse(_stream_chart(time_range, tuple(providers), bucket), media_type="application/x-ndjson")
     
+    return Response(content=_compute_chart(time_range, tuple(providers), bucket), media_type="application/json")
+
+@lru_cache(maxsize=64)
+def _compute_chart(time_range: str, providers: tuple, now: datetime) -> bytes:
+    """Simulierte Preisverläufe für einen Zeitraum, als JSON-Bytes"""
+    meta, series = _chart_series(time_range, providers, now)
+    return orjson.dumps({"datasets": dict(series), **meta})
+
+def _stream_chart(time_range: str, providers: tuple, now: datetime):
+    """Simulierte Preisverläufe als NDJSON-Zeilen"""
+    meta, series = _chart_series(time_range, providers, now)
+    yield orjson.dumps(meta) + b"\n"
+    for provider, points in series:
+        yield orjson.dumps({"provider": provider, "data": points}) + b"\n"
+
+def _chart_series(time_range: str, providers: tuple, now: datetime):
+    """Metadaten des Zeitraums und ein Iterator, der die Verläufe je Provider erst bei Bedarf berechnet"""
     # Zeitraum bestimmen
     if time_range == "24h":
         hours_back = 24
@@ -87,107 +165,70 @@ async def chart_data(
     
     data_points = int(hours_back * 60 / interval_minutes)
     
-    # Provider filtern
-    all_providers = ["aWATTar", "Tibber", "ENTSO-E"]
-    if provider_ids:
-        # Parse comma-separated string to list of integers
-        try:
-            id_list = [int(id.strip()) for id in provider_ids.split(',') if id.strip()]
-            provider_map = {1: "aWATTar", 2: "Tibber", 3: "ENTSO-E"}
-            selected_providers = [provider_map.get(id) for id in id_list if id in provider_map]
-            providers = [p for p in selected_providers if p]
-        except (ValueError, AttributeError):
-            providers = all_providers
-    else:
-        providers = all_providers
-    
-    data = {}
+    # Zeitachse (volle Stunden) und Kalenderwerte einmal als Arrays berechnen
+    i = np.arange(data_points)
+    time_points = np.datetime64(now, 'h') - ((data_points - 1 - i) * interval_minutes // 60).astype('timedelta64[h]')
+    days = time_points.astype('datetime64[D]')
+    hour_of_day = (time_points - days).astype(int)
+    weekday = (days.astype(int) + 3) % 7  # 1970-01-01 war ein Donnerstag
+    month_index = time_points.astype('datetime64[M]').astype(int) % 12
+    timestamps = time_points.astype('datetime64[us]').tolist()
     
-    # Sonnenzeiten für Deutschland
-    sunrise_hour = 7.0
-    sunset_hour = 19.0
+    # Wochentag-, Sonnenstand- und Saisoneffekt aus den Lookup-Tabellen
+    calendar_factor = _WEEKDAY[weekday] * _SOLAR_FACTOR[hour_of_day] * _SEASONAL[month_index]
     
-    # Historische Preis-Trends simulieren
-    random.seed(42)  # Für konsistente "historische" Daten
-    
-    for provider in providers:
-        provider_data = []
+    def series():
+        # Historische Preis-Trends simulieren
+        rng = np.random.default_rng(42)  # Für konsistente "historische" Daten
         
-        for i in range(data_points):
-            time_point = now - timedelta(minutes=(data_points-1-i) * interval_minutes)
-            hour_of_day = time_point.hour + time_point.minute / 60.0
-            
+        for provider in providers:
             # Basis-Preis je Provider mit historischem Trend
             if provider == "aWATTar":
-                base_price = 25 + math.sin(i / 50.0) * 3  # Langzeit-Schwankung
+                base_price = 25 + np.sin(i / 50.0) * 3  # Langzeit-Schwankung
             elif provider == "Tibber":
-                base_price = 27 + math.cos(i / 40.0) * 2
+                base_price = 27 + np.cos(i / 40.0) * 2
             else:  # ENTSO-E
-                base_price = 23 + math.sin(i / 60.0) * 4
+                base_price = 23 + np.sin(i / 60.0) * 4
             
-            # Wochentag-Effekt (Wochenende günstiger)
-            weekday = time_point.weekday()
-            if weekday >= 5:  # Weekend
-                base_price *= 0.9
+            price = base_price * calendar_factor + rng.uniform(-2, 2, size=data_points)
+            prices = np.maximum(price, 5).round(2).tolist()  # Mindestpreis 5 ct/kWh
             
-            # Sonnenstand-basierte Preismodulation
-            if sunrise_hour <= hour_of_day <= sunset_hour:
-                sun_angle = math.sin((hour_of_day - sunrise_hour) / (sunset_hour - sunrise_hour) * math.pi)
-                solar_factor = 1 + (sun_angle * 0.3)
-            else:
-                solar_factor = 0.7
-            
-            # Saisonaler Effekt (Winter teurer)
-            month = time_point.month
-            if month in [12, 1, 2]:  # Winter
-                seasonal_factor = 1.2
-            elif month in [6, 7, 8]:  # Sommer
-                seasonal_factor = 0.9
-            else:
-                seasonal_factor = 1.0
-            
-            price = base_price * solar_factor * seasonal_factor + random.uniform(-2, 2)
-            provider_data.append({
-                "x": time_point.isoformat(),
-                "y": round(max(price, 5), 2)  # Mindestpreis 5 ct/kWh
-            })
-        
-        data[provider] = provider_data
+            yield provider, [{"x": x, "y": y} for x, y in zip(timestamps, prices)]
     
     # Sonnenverlauf-Informationen hinzufügen
     sun_data = {
         "sunrise": {
-            "time": (now.replace(hour=7, minute=0, second=0, microsecond=0)).isoformat(),
+            "time": now.replace(hour=7, minute=0, second=0, microsecond=0),
             "hour": 7.0
         },
         "sunset": {
-            "time": (now.replace(hour=19, minute=0, second=0, microsecond=0)).isoformat(),
+            "time": now.replace(hour=19, minute=0, second=0, microsecond=0),
             "hour": 19.0
         },
         "solar_noon": {
-            "time": (now.replace(hour=13, minute=0, second=0, microsecond=0)).isoformat(),
+            "time": now.replace(hour=13, minute=0, second=0, microsecond=0),
             "hour": 13.0
         }
     }
     
-    return {
-        "datasets": data,
+    meta = {
         "sun_data": sun_data,
         "time_range": time_range,
         "unit": "ct/kWh",
-        "start_time": (now - timedelta(hours=hours_back)).isoformat(),
-        "end_time": now.isoformat(),
+        "start_time": now - timedelta(hours=hours_back),
+        "end_time": now,
         "data_points": data_points
     }
+    return meta, series()
 
 @app.get("/api/v1/stats/daily-average")
 async def daily_stats():
-    import random
+    average_price, min_price, max_price = (np.array([25, 18, 30]) + _RNG.random(3) * [5, 3, 5]).round(2).tolist()
     return [{
         "date": "2025-09-26",
-        "average_price": round(25 + random.random() * 5, 2),
-        "min_price": round(18 + random.random() * 3, 2),
-        "max_price": round(30 + random.random() * 5, 2),
+        "average_price": average_price,
+        "min_price": min_price,
+        "max_price": max_price,
         "data_points": 24
     }]
 
@@ -197,62 +238,32 @@ async def daily_averages(
     days_back: int = 7
 ):
     """Tagesmittelpreise nach Uhrzeit für den gewählten Zeitraum"""
-    import random
-    from datetime import datetime, timedelta
-    import math
+    # Preismuster über mehrere Tage analysieren: eine Zeile pro Tag in der Vergangenheit
+    prices = _HOUR_BASE_PRICE + _RNG.uniform(_HOUR_NOISE_LOW, _HOUR_NOISE_HIGH, size=(days_back, 24))
     
-    # Preismuster über mehrere Tage analysieren
-    daily_price_data = {}
+    # Wochentag- und Saisoneffekt je Tag
+    now = datetime.now()
+    target_dates = [now - timedelta(days=day_offset) for day_offset in range(days_back)]
+    weekdays = np.array([target_date.weekday() for target_date in target_dates])
+    month_index = np.array([target_date.month - 1 for target_date in target_dates])
+    prices *= (_DAILY_WEEKDAY[weekdays] * _DAILY_SEASONAL[month_index])[:, None]
+    prices = np.maximum(prices, 8.0)  # Minimum 8 ct/kWh
     
-    # Für jeden Tag in der Vergangenheit
-    for day_offset in range(days_back):
-        day_prices = []
-        
-        for hour in range(24):
-            # Realistische Preisverteilung über den Tag
-            if 6 <= hour <= 8:  # Morgen-Peak
-                base_price = 28 + random.uniform(-2, 3)
-            elif 11 <= hour <= 15:  # Solar-Peak (höchste Preise)
-                base_price = 32 + random.uniform(-1, 5)
-            elif 18 <= hour <= 21:  # Abend-Peak
-                base_price = 30 + random.uniform(-2, 4)
-            elif 22 <= hour <= 5:   # Nacht (niedrigste Preise)
-                base_price = 18 + random.uniform(-1, 2)
-            else:
-                base_price = 24 + random.uniform(-2, 3)
-            
-            # Wochentag-Effekt
-            target_date = datetime.now() - timedelta(days=day_offset)
-            if target_date.weekday() >= 5:  # Wochenende
-                base_price *= 0.85
-            
-            # Saisonaler Effekt
-            month = target_date.month
-            if month in [12, 1, 2]:
-                base_price *= 1.15
-            elif month in [6, 7, 8]:
-                base_price *= 0.95
-                
-            day_prices.append(max(base_price, 8.0))  # Minimum 8 ct/kWh
-        
-        daily_price_data[day_offset] = day_prices
+    # Durchschnitte, Min und Max über alle Tage je Stunde
+    hourly_avg = prices.mean(axis=0).round(2).tolist()
+    hourly_min = prices.min(axis=0).round(2).tolist()
+    hourly_max = prices.max(axis=0).round(2).tolist()
     
-    # Durchschnitte über alle Tage berechnen
-    hourly_averages = []
-    for hour in range(24):
-        hour_sum = sum(daily_price_data[day][hour] for day in range(days_back))
-        hour_avg = hour_sum / days_back
-        
-        # Min/Max für den Stundenwert ermitteln
-        hour_prices = [daily_price_data[day][hour] for day in range(days_back)]
-        
-        hourly_averages.append({
+    hourly_averages = [
+        {
             "hour": hour,
-            "average_price": round(hour_avg, 2),
-            "min_price": round(min(hour_prices), 2),
-            "max_price": round(max(hour_prices), 2),
+            "average_price": hourly_avg[hour],
+            "min_price": hourly_min[hour],
+            "max_price": hourly_max[hour],
             "time_label": f"{hour:02d}:00"
-        })
+        }
+        for hour in range(24)
+    ]
     
     return {
         "hourly_averages": hourly_averages,
@@ -265,51 +276,60 @@ async def daily_averages(
 @app.get("/api/v1/analysis/energy-sources")
 async def energy_sources(time_range: str = "24h"):
     """Energieeinspeisungen nach Quelle über den Tag"""
-    import random
-    from datetime import datetime, timedelta
+    # Simulierte Energiequellen-Daten basierend auf realistischen Mustern, eine Spalte pro Stunde
+    hours = _HOURS
     
-    # Simulierte Energiequellen-Daten basierend auf realistischen Mustern
-    sources_data = []
+    # Solar: Nur tagsüber, Peak um Mittag
+    solar_factor = np.where((hours >= 6) & (hours <= 18), np.maximum(0, 1 - np.abs(hours - 12) / 6) ** 2, 0)
+    solar = solar_factor * (25000 + _RNG.integers(-3000, 3001, 24))  # MW
     
-    for hour in range(24):
-        # Solar: Nur tagsüber, Peak um Mittag
-        if 6 <= hour <= 18:
-            solar_factor = max(0, (1 - abs(hour - 12) / 6)) ** 2
-            solar = solar_factor * (25000 + random.randint(-3000, 3000))  # MW
-        else:
-            solar = 0
-        
-        # Wind: Variabel, oft nachts stärker
-        wind_base = 15000 if 20 <= hour or hour <= 6 else 8000
-        wind = wind_base + random.randint(-4000, 6000)
-        wind = max(0, wind)
-        
-        # Wasser: Relativ konstant
-        hydro = 4000 + random.randint(-500, 500)
-        
-        # Biomasse: Konstant regelbar
-        biomass = 8000 + random.randint(-1000, 1000)
-        
-        # Fossile Energie (Kohle, Gas): Füllt Lücken auf
-        renewable_total = solar + wind + hydro + biomass
-        total_demand = 45000 + random.randint(-5000, 8000)  # Simulierte Gesamtnachfrage
-        
-        fossil = max(0, total_demand - renewable_total)
-        nuclear = 8000 + random.randint(-1000, 1000)  # Grundlast
-        
-        sources_data.append({
+    # Wind: Variabel, oft nachts stärker
+    wind_base = np.where((hours >= 20) | (hours <= 6), 15000, 8000)
+    wind = np.maximum(0, wind_base + _RNG.integers(-4000, 6001, 24))
+    
+    # Wasser: Relativ konstant
+    hydro = 4000 + _RNG.integers(-500, 501, 24)
+    
+    # Biomasse: Konstant regelbar
+    biomass = 8000 + _RNG.integers(-1000, 1001, 24)
+    
+    # Fossile Energie (Kohle, Gas): Füllt Lücken auf
+    renewable_total = solar + wind + hydro + biomass
+    total_demand = 45000 + _RNG.integers(-5000, 8001, 24)  # Simulierte Gesamtnachfrage
+    
+    fossil = np.maximum(0, total_demand - renewable_total)
+    nuclear = 8000 + _RNG.integers(-1000, 1001, 24)  # Grundlast
+    
+    renewable_percentage = renewable_total / np.maximum(1, renewable_total + fossil + nuclear) * 100
+    
+    columns = zip(
+        hours.tolist(),
+        solar.round().astype(int).tolist(),
+        wind.tolist(),
+        hydro.tolist(),
+        biomass.tolist(),
+        nuclear.tolist(),
+        fossil.round().astype(int).tolist(),
+        renewable_total.round().astype(int).tolist(),
+        (fossil + nuclear).round().astype(int).tolist(),
+        renewable_percentage.round(1).tolist()
+    )
+    sources_data = [
+        {
             "hour": hour,
             "time_label": f"{hour:02d}:00",
-            "solar": round(solar),
-            "wind": round(wind), 
-            "hydro": round(hydro),
-            "biomass": round(biomass),
-            "nuclear": round(nuclear),
-            "fossil": round(fossil),
-            "total_renewable": round(solar + wind + hydro + biomass),
-            "total_fossil": round(fossil + nuclear),
-            "renewable_percentage": round((solar + wind + hydro + biomass) / max(1, renewable_total + fossil + nuclear) * 100, 1)
-        })
+            "solar": solar_mw,
+            "wind": wind_mw,
+            "hydro": hydro_mw,
+            "biomass": biomass_mw,
+            "nuclear": nuclear_mw,
+            "fossil": fossil_mw,
+            "total_renewable": total_renewable,
+            "total_fossil": total_fossil,
+            "renewable_percentage": percentage
+        }
+        for hour, solar_mw, wind_mw, hydro_mw, biomass_mw, nuclear_mw, fossil_mw, total_renewable, total_fossil, percentage in columns
+    ]
     
     return {
         "sources_data": sources_data,
@@ -318,5 +338,7 @@ async def energy_sources(time_range: str = "24h"):
     }
 
 if __name__ == "__main__":
+    import os
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # uvloop und httptools kommen mit uvicorn[standard]; zustandslos, daher ein Worker pro CPU
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, loop="uvloop", http="httptools", workers=os.cpu_count() or 1)
\ No newline at end of file
@@ -1,82 +1,104 @@
 import uvicorn
-from fastapi import FastAPI, Depends, HTTPException
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, Response
 import socketio
-from sqlalchemy.orm import Session
-from datetime import datetime, timedelta
+from datetime import datetime, timezone
 import asyncio
 import logging
 import os
+import random
+import socket
+import time
+from typing import Optional
+
+import orjson
+from redis import asyncio as aioredis
 
 from app.config import settings
-from app.database import engine, get_db
-from app.models import Base, Provider, ElectricPrice
+from app.database import engine, async_engine, AsyncSessionLocal
+from app.models import Base, upgrade_schema
 from app.api import router as api_router
+from app.services.providers import DEFAULT_PROVIDERS, ensure_providers
 
 # Logging konfigurieren
 logging.basicConfig(level=settings.log_level)
 logger = logging.getLogger(__name__)
 
-# Datenbank-Tabellen erstellen
-Base.metadata.create_all(bind=engine)
+class _OrjsonAdapter:
+    """json-Modul-Ersatz für Socket.IO auf Basis von orjson"""
+    
+    @staticmethod
+    def dumps(obj, **kwargs):
+        return orjson.dumps(obj).decode()
+    
+    @staticmethod
+    def loads(s, **kwargs):
+        return orjson.loads(s)
+
+# Mehrere Worker/Instanzen teilen Räume und Broadcasts über Redis (Pub/Sub)
+_SHARED_ROOMS = settings.socketio_redis or settings.web_workers > 1
 
 # Socket.IO Server
 sio = socketio.AsyncServer(
     async_mode='asgi',
+    client_manager=socketio.AsyncRedisManager(settings.redis_url) if _SHARED_ROOMS else None,
     cors_allowed_origins=settings.backend_cors_origins,
-    logger=False,  # Weniger verbose logging
-    engineio_logger=False
+    logger=settings.debug,  # Frame-Logging nur im Debug-Modus
+    engineio_logger=settings.debug,
+    json=_OrjsonAdapter
 )
 
 # FastAPI App
 app = FastAPI(
     title=settings.project_name,
     version="1.0.0",
-    description="API für dynamische Strompreis-Verfolgung"
+    description="API für dynamische Strompreis-Verfolgung",
+    default_response_class=ORJSONResponse
 )
 
 # CORS Middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=settings.backend_cors_origins + ["*"],  # Für Development
+    allow_origins=settings.backend_cors_origins,  # weitere Origins über BACKEND_CORS_ORIGINS
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=86400,  # Preflight-Antworten einen Tag im Browser cachen
 )
 
 # API Router
 app.include_router(api_router, prefix=settings.api_v1_str)
 
+# Frontend-Verzeichnis einmal prüfen (Static-Mounts und Platzhalter-Routen)
+_HAS_FRONTEND = os.path.isdir("frontend")
+
 # Static Files (Frontend)
-if os.path.exists("frontend"):
+if _HAS_FRONTEND:
     app.mount("/static", StaticFiles(directory="frontend"), name="static")
 
 # Socket.IO Events
 @sio.event
 async def connect(sid, environ):
-    logger.info(f"Socket.IO Client {sid} connected")
+    logger.info("Socket.IO Client %s connected", sid)
     await sio.emit('status', {'message': 'Verbindung hergestellt'}, room=sid)
 
 @sio.event
 async def disconnect(sid):
-    logger.info(f"Socket.IO Client {sid} disconnected")
+    logger.info("Socket.IO Client %s disconnected", sid)
 
 @sio.event
 async def subscribe_price_updates(sid, data):
     provider_ids = data.get('provider_ids', [])
-    logger.info(f"Client {sid} subscribes to providers: {provider_ids}")
-    for provider_id in provider_ids:
-        await sio.enter_room(sid, f'provider_{provider_id}')
+    logger.info("Client %s subscribes to providers: %s", sid, provider_ids)
+    await asyncio.gather(*(sio.enter_room(sid, f'provider_{provider_id}') for provider_id in provider_ids))
 
 # Routes
-@app.get("/", response_class=HTMLResponse)
-async def read_root():
-    try:
-        with open("frontend/index.html", "r", encoding="utf-8") as f:
-            return HTMLResponse(content=f.read())
-    except FileNotFoundError:
+if not _HAS_FRONTEND:
+    # Ohne Frontend-Verzeichnis: Platzhalter statt StaticFiles (siehe Ende der Datei)
+    @app.get("/", response_class=HTMLResponse)
+    async def read_root():
         return HTMLResponse("""
         <!DOCTYPE html>
         <html>
@@ -92,75 +114,154 @@ async def read_root():
         </body>
         </html>
         """)
+    
+    _FAVICON_JSON = orjson.dumps({"status": "no favicon"})
+    
+    @app.get("/favicon.ico")
+    async def favicon():
+        return Response(content=_FAVICON_JSON, media_type="application/json")
 
-@app.get("/favicon.ico")
-async def favicon():
-    return {"status": "no favicon"}
+# Health-Antwort wird kurz zwischengespeichert (Load-Balancer fragen im Sekundentakt)
+_HEALTH_MAX_AGE = 5  # Sekunden
+_health_cache = (0.0, b"")
 
 @app.get("/health")
 async def health_check():
-    return {
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "version": "1.0.0"
-    }
+    global _health_cache
+    expires, body = _health_cache
+    now = time.monotonic()
+    if now >= expires:
+        body = orjson.dumps({
+            "status": "healthy",
+            "timestamp": datetime.now(timezone.utc),
+            "version": "1.0.0"
+        })
+        _health_cache = (now + _HEALTH_MAX_AGE, body)
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"Cache-Control": f"max-age={_HEALTH_MAX_AGE}"}
+    )
 
-# Background task für Demo-Updates
+# Demo-Updates sendet bei mehreren Workern nur der Inhaber dieses Locks
+_BROADCAST_LOCK = "price_update_task:owner"
+_BROADCAST_LOCK_TTL = 90  # Sekunden
+_BROADCAST_OWNER = f"{socket.gethostname()}:{os.getpid()}"
+
+async def _claim_broadcast(redis_client) -> bool:
+    """Lock für die Demo-Updates übernehmen oder verlängern"""
+    if await redis_client.set(_BROADCAST_LOCK, _BROADCAST_OWNER, nx=True, ex=_BROADCAST_LOCK_TTL):
+        return True
+    if await redis_client.get(_BROADCAST_LOCK) == _BROADCAST_OWNER.encode():
+        await redis_client.expire(_BROADCAST_LOCK, _BROADCAST_LOCK_TTL)
+        return True
+    return False
+
+# Payload der Demo-Updates; pro Tick werden nur Zeitstempel und Preise überschrieben
+_PRICE_TEMPLATE = {
+    'type': 'current_prices',
+    'timestamp': '',
+    'data': [
+        {'provider_id': 1, 'provider_name': 'aWATTar', 'current_price': 0.0, 'price_change': 0.0},
+        {'provider_id': 2, 'provider_name': 'Tibber', 'current_price': 0.0, 'price_change': 0.0}
+    ]
+}
+
+# Gesampelte Preise (Zeitstempel + vier Werte) zwischen Erzeugung und Versand;
+# wird beim Start im laufenden Event-Loop angelegt
+_price_queue: Optional[asyncio.Queue] = None
+
+_PRICE_UPDATE_INTERVAL = 30  # Sekunden
+_PRICE_UPDATE_BACKOFF_MAX = 300  # Sekunden
+
+# Background task für Demo-Updates (Erzeuger)
 async def price_update_task():
+    redis_client = aioredis.from_url(settings.redis_url) if _SHARED_ROOMS else None
+    failures = 0
     while True:
         try:
-            import random
-            await sio.emit('price_update', {
-                'type': 'current_prices',
-                'timestamp': datetime.now().isoformat(),
-                'data': [
-                    {
-                        'provider_id': 1,
-                        'provider_name': 'aWATTar',
-                        'current_price': round(20 + random.random() * 10, 2),
-                        'price_change': round((random.random() - 0.5) * 4, 2)
-                    },
-                    {
-                        'provider_id': 2,
-                        'provider_name': 'Tibber',
-                        'current_price': round(22 + random.random() * 8, 2),
-                        'price_change': round((random.random() - 0.5) * 3, 2)
-                    }
-                ]
-            })
-            await asyncio.sleep(30)  # Update alle 30 Sekunden
+            if redis_client is None or await _claim_broadcast(redis_client):
+                sample = (
+                    datetime.now(timezone.utc).isoformat(),
+                    round(20 + random.random() * 10, 2),
+                    round((random.random() - 0.5) * 4, 2),
+                    round(22 + random.random() * 8, 2),
+                    round((random.random() - 0.5) * 3, 2)
+                )
+                try:
+                    _price_queue.put_nowait(sample)
+                except asyncio.QueueFull:
+                    logger.warning("Price update queue full, skipping sample")
+            failures = 0
         except Exception as e:
-            logger.error(f"Error in price update task: {e}")
-            await asyncio.sleep(60)
+            # Exponentieller Backoff mit Jitter; nur der erste Fehler einer Serie als Warnung
+            failures = min(failures + 1, 9)
+            log = logger.warning if failures == 1 else logger.debug
+            log(f"Error in price update task (attempt {failures}): {e}")
+            await asyncio.sleep(min(_PRICE_UPDATE_BACKOFF_MAX, 2 ** failures) + random.random())
+            continue
+        await asyncio.sleep(_PRICE_UPDATE_INTERVAL)
+
+# Versand der Demo-Updates (Verbraucher); langsame Clients bremsen das Sampling nicht
+async def price_emit_task():
+    awattar, tibber = _PRICE_TEMPLATE['data']
+    while True:
+        sample = await _price_queue.get()
+        try:
+            (_PRICE_TEMPLATE['timestamp'],
+             awattar['current_price'], awattar['price_change'],
+             tibber['current_price'], tibber['price_change']) = sample
+            await sio.emit('price_update', _PRICE_TEMPLATE)
+        except Exception as e:
+            logger.error(f"Error emitting price update: {e}")
+        finally:
+            _price_queue.task_done()
 
 @app.on_event("startup")
 async def startup_event():
     logger.info("Starting Electric Price Tracker")
     
-    # Provider in DB erstellen
-    db = next(get_db())
-    try:
-        providers = [
-            {"name": "aWATTar", "display_name": "aWATTar", "country_code": "DE"},
-            {"name": "Tibber", "display_name": "Tibber", "country_code": "DE"},
-            {"name": "ENTSO-E", "display_name": "ENTSO-E", "country_code": "DE"},
-        ]
-        
-        for provider_data in providers:
-            existing = db.query(Provider).filter(Provider.name == provider_data["name"]).first()
-            if not existing:
-                provider = Provider(**provider_data)
-                db.add(provider)
-        
-        db.commit()
-    except Exception as e:
-        logger.error(f"Error creating providers: {e}")
-        db.rollback()
-    finally:
-        db.close()
+    # Datenbank-Tabellen erstellen
+    if settings.db_init:
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+            await conn.run_sync(upgrade_schema)
+    
+    # Provider in DB erstellen (async, blockiert den Event-Loop nicht)
+    async with AsyncSessionLocal() as db:
+        try:
+            await ensure_providers(db, DEFAULT_PROVIDERS)
+        except Exception as e:
+            logger.error(f"Error creating providers: {e}")
+            await db.rollback()
+    
+    # Eager Tasks (ab Python 3.12): Coroutinen laufen bis zur ersten Suspension direkt
+    if hasattr(asyncio, "eager_task_factory"):
+        asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
     
-    # Background task starten
+    # Background tasks starten
+    global _price_queue
+    _price_queue = asyncio.Queue(maxsize=8)
     asyncio.create_task(price_update_task())
+    asyncio.create_task(price_emit_task())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Async-Verbindungen schließen
+    await async_engine.dispose()
+
+# Frontend unter "/" (index.html, app.js, style.css, favicon.ico); muss nach allen Routen kommen
+class CachedStaticFiles(StaticFiles):
+    """StaticFiles mit Browser-Cache für Assets (index.html wird immer revalidiert)"""
+    
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        if not str(full_path).endswith(".html"):
+            response.headers["Cache-Control"] = "public, max-age=3600"
+        return response
+
+if _HAS_FRONTEND:
+    app.mount("/", CachedStaticFiles(directory="frontend", html=True), name="frontend")
 
 # Socket.IO App mounten
 socket_asgi_app = socketio.ASGIApp(
@@ -170,4 +271,19 @@ socket_asgi_app = socketio.ASGIApp(
 )
 
 if __name__ == "__main__":
-    uvicorn.run(socket_asgi_app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    # Tabellen einmal im Hauptprozess anlegen, die Worker überspringen das
+    if settings.db_init and settings.web_workers > 1:
+        Base.metadata.create_all(bind=engine)
+        with engine.begin() as conn:
+            upgrade_schema(conn)
+        os.environ["DB_INIT"] = "false"
+    
+    # Ein Event-Loop pro Worker; ab WEB_WORKERS>1 laufen Räume über Redis
+    uvicorn.run(
+        "main_socket:socket_asgi_app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=settings.web_workers
+    )
\ No newline at end of file
@@ -0,0 +1,21 @@
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.database import Base
+from app.models import Provider
+
+
+@pytest_asyncio.fixture
+async def db():
+    """Frische In-Memory-SQLite-Datenbank mit einem Provider"""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        session.add(Provider(id=1, name="aWATTar", display_name="aWATTar"))
+        await session.commit()
+        yield session
+    
+    await engine.dispose()
@@ -0,0 +1,30 @@
+from datetime import datetime, timedelta, timezone
+
+from app import cache
+from app.api import get_current_prices
+from app.models import ElectricPrice
+
+
+async def test_current_prices_cache_expires_at_slot_end(db, monkeypatch):
+    stored = {}
+    
+    async def get_cached(key):
+        return None
+    
+    async def set_cached(key, value, ttl):
+        stored[key] = ttl
+    
+    monkeypatch.setattr(cache, "get_cached", get_cached)
+    monkeypatch.setattr(cache, "set_cached", set_cached)
+    
+    slot = datetime(2024, 1, 1, 10, tzinfo=timezone.utc)
+    db.add(ElectricPrice(
+        provider_id=1, timestamp=slot, start_time=slot,
+        end_time=slot + timedelta(minutes=15), price_per_kwh=10.0
+    ))
+    await db.commit()
+    
+    result = await get_current_prices(now=slot + timedelta(minutes=10), db=db)
+    
+    assert [price["current_price"] for price in result] == [10.0]
+    assert stored[cache.CURRENT_PRICES_KEY] == 300
@@ -0,0 +1,32 @@
+from datetime import datetime, timezone
+
+from app.data_collectors.providers import ENTSOECollector
+
+
+def _document(curve_type, points):
+    points = "".join(
+        f"<Point><position>{position}</position><price.amount>{price}</price.amount></Point>"
+        for position, price in points
+    )
+    return (
+        '<Publication_MarketDocument xmlns="urn:iec62325.351:tc57wg16:451-3:publicationdocument:7:3">'
+        f"<TimeSeries><curveType>{curve_type}</curveType><Period>"
+        "<timeInterval><start>2024-01-01T00:00Z</start><end>2024-01-01T01:00Z</end></timeInterval>"
+        f"<resolution>PT15M</resolution>{points}</Period></TimeSeries>"
+        "</Publication_MarketDocument>"
+    ).encode()
+
+
+def test_parse_a03_fills_omitted_positions_up_to_period_end():
+    prices = ENTSOECollector("key")._parse_xml_response(_document("A03", [(1, 50.0), (3, 70.0)]))
+    
+    assert [(item["timestamp"].minute, item["price"]) for item in prices] == [
+        (0, 50.0), (15, 50.0), (30, 70.0), (45, 70.0)
+    ]
+    assert prices[0]["timestamp"] == datetime(2024, 1, 1, tzinfo=timezone.utc)
+
+
+def test_parse_a01_keeps_points_as_delivered():
+    prices = ENTSOECollector("key")._parse_xml_response(_document("A01", [(1, 50.0), (3, 70.0)]))
+    
+    assert [(item["timestamp"].minute, item["price"]) for item in prices] == [(0, 50.0), (30, 70.0)]
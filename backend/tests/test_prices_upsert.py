@@ -0,0 +1,91 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.data_collectors.base import BaseDataCollector
+from app.models import ElectricPrice, upgrade_schema
+
+
+def _rows(prices):
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "provider_id": 1,
+            "timestamp": start + timedelta(hours=hour),
+            "start_time": start + timedelta(hours=hour),
+            "end_time": start + timedelta(hours=hour + 1),
+            "price_per_kwh": price,
+        }
+        for hour, price in enumerate(prices)
+    ]
+
+
+async def test_upsert_counts_only_new_or_changed_rows(db):
+    assert await BaseDataCollector._upsert_prices(db, _rows([10.0, 11.0])) == 2
+    assert await BaseDataCollector._upsert_prices(db, _rows([10.0, 11.0])) == 0
+    assert await BaseDataCollector._upsert_prices(db, _rows([10.0, 12.5])) == 1
+
+
+async def test_upsert_collapses_duplicate_keys_within_one_batch(db):
+    hourly, quarter = _rows([10.0])[0], _rows([12.0])[0]
+    quarter["end_time"] = quarter["start_time"] + timedelta(minutes=15)
+    
+    assert await BaseDataCollector._upsert_prices(db, [quarter, hourly]) == 1
+    assert await BaseDataCollector._upsert_prices(db, [quarter, hourly]) == 0
+    
+    assert (await db.execute(select(ElectricPrice.price_per_kwh))).scalars().all() == [12.0]
+
+
+async def test_upgrade_schema_migrates_existing_table():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    try:
+        async with engine.begin() as conn:
+            # Tabelle im ursprünglichen Stand: ohne Unique-Constraint, total_price als normale Spalte, mit Dubletten
+            await conn.execute(text(
+                "CREATE TABLE electric_prices (id INTEGER PRIMARY KEY, provider_id INTEGER NOT NULL, "
+                "timestamp DATETIME NOT NULL, start_time DATETIME NOT NULL, end_time DATETIME NOT NULL, "
+                "price_per_kwh FLOAT NOT NULL, price_unit VARCHAR(10), price_type VARCHAR(20), "
+                "taxes FLOAT, grid_fees FLOAT, total_price FLOAT)"
+            ))
+            await conn.execute(text("CREATE INDEX ix_total_price_ts ON electric_prices (total_price, timestamp DESC)"))
+            await conn.execute(text(
+                "INSERT INTO electric_prices VALUES "
+                "(1, 1, '2024-01-01 00:00:00', '2024-01-01 00:00:00', '2024-01-01 01:00:00', 10.0, 'ct/kWh', 'spot', 1.0, 2.0, 13.0), "
+                "(2, 1, '2024-01-01 00:00:00', '2024-01-01 00:00:00', '2024-01-01 01:00:00', 11.0, 'ct/kWh', 'spot', 1.0, NULL, NULL)"
+            ))
+            
+            await conn.run_sync(upgrade_schema)
+            await conn.run_sync(upgrade_schema)  # idempotent
+        
+        async with AsyncSession(engine) as db:
+            # neue Zeilen erhalten total_price von der Datenbank
+            await BaseDataCollector._upsert_prices(db, [{**_rows([20.0])[0], "taxes": 1.0, "grid_fees": 2.0}])
+            await db.commit()
+            
+            rows = (await db.execute(text("SELECT id, price_per_kwh, total_price FROM electric_prices ORDER BY id"))).all()
+            indexes = await db.run_sync(lambda session: inspect(session.connection()).get_indexes("electric_prices"))
+    finally:
+        await engine.dispose()
+    
+    assert [tuple(row) for row in rows] == [(2, 11.0, 12.0), (3, 20.0, 23.0)]
+    assert "uq_price_provider_start" in {index["name"] for index in indexes if index["unique"]}
+    assert "ix_total_price_ts" in {index["name"] for index in indexes}
+
+
+async def test_upgrade_schema_restores_missing_indexes(db):
+    # Tabellen mit aktuellem Spaltenstand, aber aus einer Version ohne diese Indizes
+    missing = {
+        "electric_prices": "ix_start_end_time",
+        "data_collection_logs": "ix_dcl_provider_time_desc",
+        "price_alerts": "ix_alerts_active_threshold",
+    }
+    for name in missing.values():
+        await db.execute(text(f"DROP INDEX {name}"))
+    
+    await db.run_sync(lambda session: upgrade_schema(session.connection()))
+    
+    for table, name in missing.items():
+        indexes = await db.run_sync(lambda session: inspect(session.connection()).get_indexes(table))
+        assert name in {index["name"] for index in indexes}
@@ -0,0 +1,29 @@
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import select
+
+from app.models import ElectricPrice, ElectricPriceHourly
+from app.services.rollups import refresh_hourly_prices
+
+
+async def _hourly(db):
+    row = (await db.execute(select(ElectricPriceHourly.avg_price, ElectricPriceHourly.data_points))).one()
+    return tuple(row)
+
+
+async def test_incremental_refresh_keeps_complete_oldest_hour(db):
+    hour = datetime(2024, 1, 1, 10, tzinfo=timezone.utc)
+    for quarter in range(4):
+        start = hour + timedelta(minutes=15 * quarter)
+        db.add(ElectricPrice(
+            provider_id=1, timestamp=start, start_time=start,
+            end_time=start + timedelta(minutes=15), price_per_kwh=quarter + 1.0
+        ))
+    await db.commit()
+    
+    await refresh_hourly_prices(db)
+    assert await _hourly(db) == (2.5, 4)
+    
+    # Fenster beginnt mitten in der Stunde: Bucket muss vollständig bleiben
+    await refresh_hourly_prices(db, since=hour.replace(minute=40))
+    assert await _hourly(db) == (2.5, 4)
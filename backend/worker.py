@@ -1,11 +1,20 @@
 import asyncio
 import logging
+import signal
 import sys
 import os
 
+try:
+    import uvloop
+except ImportError:  # z.B. unter Windows
+    uvloop = None
+
 # Add the app directory to Python path
 sys.path.append('/app')
 
+from app.config import settings
+from app.database import async_engine
+from app.models import upgrade_schema
 from app.services.scheduler import scheduler_instance
 
 logging.basicConfig(level=logging.INFO)
@@ -15,11 +24,30 @@ async def main():
     """Hauptfunktion für den Data Collection Worker"""
     try:
         logger.info("Starte Data Collection Worker...")
+        
+        # Eager Tasks (ab Python 3.12): Coroutinen laufen bis zur ersten Suspension direkt
+        if hasattr(asyncio, "eager_task_factory"):
+            asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+        
+        # Worker schläft bis SIGINT/SIGTERM, statt minütlich aufzuwachen
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, stop.set)
+            except NotImplementedError:  # z.B. unter Windows
+                pass
+        
+        # Bestehende Datenbank an das Modell anpassen, bevor gesammelt wird
+        if settings.db_init:
+            async with async_engine.begin() as conn:
+                await conn.run_sync(upgrade_schema)
+        
         scheduler_instance.start()
+        await stop.wait()
         
-        # Worker läuft endlos
-        while True:
-            await asyncio.sleep(60)  # Alle Minute überprüfen
+        logger.info("Data Collection Worker wird beendet...")
+        scheduler_instance.stop()
             
     except KeyboardInterrupt:
         logger.info("Data Collection Worker wird beendet...")
@@ -28,6 +56,11 @@ async def main():
         logger.error(f"Fehler im Data Collection Worker: {e}")
         scheduler_instance.stop()
         sys.exit(1)
+    finally:
+        await scheduler_instance.close_collectors()
+        await async_engine.dispose()
 
 if __name__ == "__main__":
+    if uvloop is not None:
+        uvloop.install()
     asyncio.run(main())
\ No newline at end of file
@@ -5,10 +5,42 @@ INSERT INTO providers (name, display_name, country_code, currency, is_active) VA
 ('ENTSO-E', 'ENTSO-E', 'DE', 'EUR', true)
 ON CONFLICT (name) DO NOTHING;
 
+-- Konfliktziel für den Upsert der Collectors (ältere Tabellen ohne Constraint: erst Dubletten entfernen)
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_constraint WHERE conname = 'uq_price_provider_start') THEN
+        DELETE FROM electric_prices a USING electric_prices b
+        WHERE a.provider_id = b.provider_id AND a.start_time = b.start_time AND a.id < b.id;
+        ALTER TABLE electric_prices ADD CONSTRAINT uq_price_provider_start UNIQUE (provider_id, start_time);
+    END IF;
+END $$;
+
+-- total_price als generierte Spalte (ältere Tabellen: normale Spalte, wird nicht mehr befüllt)
+DO $$
+BEGIN
+    IF EXISTS (
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'electric_prices' AND column_name = 'total_price' AND is_generated = 'NEVER'
+    ) THEN
+        UPDATE electric_prices SET taxes = 0 WHERE taxes IS NULL;
+        UPDATE electric_prices SET grid_fees = 0 WHERE grid_fees IS NULL;
+        ALTER TABLE electric_prices
+            ALTER COLUMN taxes SET DEFAULT 0, ALTER COLUMN taxes SET NOT NULL,
+            ALTER COLUMN grid_fees SET DEFAULT 0, ALTER COLUMN grid_fees SET NOT NULL;
+        ALTER TABLE electric_prices DROP COLUMN total_price;
+        ALTER TABLE electric_prices ADD COLUMN total_price DOUBLE PRECISION
+            GENERATED ALWAYS AS (price_per_kwh + taxes + grid_fees) STORED;
+    END IF;
+END $$;
+
 -- Index für bessere Performance
 CREATE INDEX IF NOT EXISTS idx_electric_prices_timestamp ON electric_prices(timestamp);
-CREATE INDEX IF NOT EXISTS idx_electric_prices_provider_timestamp ON electric_prices(provider_id, timestamp);
+CREATE INDEX IF NOT EXISTS ix_provider_ts_desc ON electric_prices(provider_id, timestamp DESC) INCLUDE (price_per_kwh, total_price, price_unit);
 CREATE INDEX IF NOT EXISTS idx_electric_prices_start_end_time ON electric_prices(start_time, end_time);
+CREATE INDEX IF NOT EXISTS ix_total_price_ts ON electric_prices(total_price, timestamp DESC);
+CREATE INDEX IF NOT EXISTS ix_prices_ts_brin ON electric_prices USING brin (timestamp) WITH (pages_per_range = 32);
+CREATE INDEX IF NOT EXISTS ix_dcl_provider_time_desc ON data_collection_logs(provider_id, collection_time DESC);
+CREATE INDEX IF NOT EXISTS ix_alerts_active_threshold ON price_alerts(provider_id, threshold_price) WHERE is_active = true;
 
 -- Beispiel Alert für günstige Preise
 INSERT INTO price_alerts (name, provider_id, threshold_price, alert_type, is_active, time_window_hours, min_duration_minutes)